@@ -2,16 +2,23 @@ from fastapi import FastAPI, Depends, status, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from anyio import to_thread
 from sqlalchemy.orm import Session
 import os
 try:
-    from .database import engine, SessionLocal, get_db
+    from .database import engine, SessionLocal, get_db, migrate_schema
     from . import models, schemas
-    from .routers import song_router, user_router, favorites_router
+    from .services.chart_service import ensure_charts_seeded
+    from .services.batch_job_service import fail_interrupted_jobs
+    from .services.admission_service import AdmissionControlMiddleware, saturation
+    from .routers import song_router, user_router, favorites_router, charts_router, playlists_router, upload_sessions_router
 except ImportError:
-    from database import engine, SessionLocal, get_db
+    from database import engine, SessionLocal, get_db, migrate_schema
     import models, schemas
-    from routers import song_router, user_router, favorites_router
+    from services.chart_service import ensure_charts_seeded
+    from services.batch_job_service import fail_interrupted_jobs
+    from services.admission_service import AdmissionControlMiddleware, saturation
+    from routers import song_router, user_router, favorites_router, charts_router, playlists_router, upload_sessions_router
 
 app = FastAPI(
     title="Rock 'em All",
@@ -19,19 +26,37 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Added before CORS so that CORS wraps it and 503s carry CORS headers
+app.add_middleware(AdmissionControlMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let cross-origin clients (the service worker's audio cache) read these
+    expose_headers=["Accept-Ranges", "Content-Range", "ETag", "Retry-After"],
 )
 
 models.Base.metadata.create_all(bind=engine)
+migrate_schema(models.Base.metadata)
+
+with SessionLocal() as db:
+    ensure_charts_seeded(db)
+
+@app.on_event("startup")
+def recover_batch_jobs():
+    # At startup rather than import, so only a serving process does it
+    with SessionLocal() as db:
+        fail_interrupted_jobs(db)
 
 app.include_router(song_router, prefix="/api/v1")
 app.include_router(user_router, prefix="/api/v1")
 app.include_router(favorites_router, prefix="/api/v1")
+app.include_router(charts_router, prefix="/api/v1")
+app.include_router(playlists_router, prefix="/api/v1")
+app.include_router(upload_sessions_router, prefix="/api/v1")
 
 uploads_dir = "uploads"
 if os.path.exists(uploads_dir):
@@ -47,8 +72,31 @@ def read_root():
     }
 
 @app.get("/health")
-def health_check():
-    return {"status": "healthy", "message": "Music Player API is running"}
+async def health_check():
+    """
+    Report load: slots in use and queued requests per endpoint class, and
+    worker threadpool usage. Status is "busy" when any class or the
+    threadpool is at capacity and "saturated" once a wait queue is full
+    (new requests of that class are being rejected).
+    """
+    limits = saturation()
+    threads = to_thread.current_default_thread_limiter()
+    threadpool = {"in_use": threads.borrowed_tokens, "size": threads.total_tokens}
+
+    if any(limit["queued"] >= limit["max_queued"] for limit in limits.values()):
+        health = "saturated"
+    elif (any(limit["active"] >= limit["max_active"] for limit in limits.values())
+            or threadpool["in_use"] >= threadpool["size"]):
+        health = "busy"
+    else:
+        health = "healthy"
+
+    return {
+        "status": health,
+        "message": "Music Player API is running",
+        "limits": limits,
+        "threadpool": threadpool
+    }
 
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
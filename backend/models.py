@@ -2,7 +2,7 @@ try:
     from .database import Base
 except ImportError:
     from database import Base
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -16,6 +16,7 @@ class User(Base):
     # Relationships
     favorites = relationship("Favorite", back_populates="user")
     songs = relationship("Song", back_populates="user")
+    playlists = relationship("Playlist", back_populates="user")
 
 class Song(Base):
     __tablename__ = "songs"
@@ -23,19 +24,28 @@ class Song(Base):
     title = Column(String, index=True)
     artist = Column(String, index=True)
     album = Column(String, nullable=True)
-    genre = Column(String, nullable=True)
-    year = Column(Integer, nullable=True)
+    genre = Column(String, nullable=True, index=True)
+    year = Column(Integer, nullable=True, index=True)
     duration = Column(Float, nullable=True)  
     file_path = Column(String, unique=True, index=True)
     file_type = Column(String, index=True)  
     file_size = Column(Integer, nullable=True)  
     image_path = Column(String, nullable=True)
+    # Loudness normalization (see services/loudness_service.py)
+    loudness = Column(Float, nullable=True)  # integrated loudness, LUFS
+    peak = Column(Float, nullable=True)  # sample peak, 1.0 = full scale
+    replay_gain = Column(Float, nullable=True)  # dB to reach the reference level
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  
     
     # Relationships
     user = relationship("User", back_populates="songs")
     favorites = relationship("Favorite", back_populates="song", cascade="all, delete-orphan")
+    stats = relationship("SongStat", back_populates="song", cascade="all, delete-orphan")
+    trend = relationship("SongTrend", back_populates="song", uselist=False, cascade="all, delete-orphan")
+    playlist_items = relationship("PlaylistSong", back_populates="song", cascade="all, delete-orphan")
+    fingerprint = relationship("SongFingerprint", back_populates="song", uselist=False, cascade="all, delete-orphan")
+    fingerprint_hashes = relationship("FingerprintHash", cascade="all, delete-orphan")
 
 class Favorite(Base):
     __tablename__ = "favorites"
@@ -48,3 +58,188 @@ class Favorite(Base):
     user = relationship("User", back_populates="favorites")
     song = relationship("Song", back_populates="favorites")
 
+
+class SongStat(Base):
+    """
+    Materialized play/favorite counters for one song in one time bucket.
+    period is 'day', 'week' or 'all'; bucket_start is the start of the bucket (UTC).
+    """
+    __tablename__ = "song_stats"
+    id = Column(Integer, primary_key=True, index=True)
+    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False)
+    period = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    plays = Column(Integer, nullable=False, default=0)
+    favorites = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("song_id", "period", "bucket_start", name="uq_song_stats_bucket"),
+        Index("ix_song_stats_plays", "period", "bucket_start", "plays"),
+        Index("ix_song_stats_favorites", "period", "bucket_start", "favorites"),
+    )
+
+    # Relationships
+    song = relationship("Song", back_populates="stats")
+
+class ArtistStat(Base):
+    """
+    Materialized play/favorite counters for one artist in one time bucket.
+    """
+    __tablename__ = "artist_stats"
+    id = Column(Integer, primary_key=True, index=True)
+    artist = Column(String, nullable=False)
+    period = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    plays = Column(Integer, nullable=False, default=0)
+    favorites = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("artist", "period", "bucket_start", name="uq_artist_stats_bucket"),
+        Index("ix_artist_stats_plays", "period", "bucket_start", "plays"),
+        Index("ix_artist_stats_favorites", "period", "bucket_start", "favorites"),
+    )
+
+class SongTrend(Base):
+    """
+    Time-decayed trending score for a song, stored in log2 space relative to a
+    fixed epoch so that ordering never needs to be recomputed as time passes.
+    """
+    __tablename__ = "song_trends"
+    song_id = Column(Integer, ForeignKey("songs.id"), primary_key=True)
+    log_score = Column(Float, nullable=False, index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    song = relationship("Song", back_populates="trend")
+
+class Playlist(Base):
+    """
+    A user's playlist, or their saved play queue when kind == 'queue'.
+    """
+    __tablename__ = "playlists"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    kind = Column(String, nullable=False, server_default="playlist", index=True)
+    current_item_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    user = relationship("User", back_populates="playlists")
+    items = relationship("PlaylistSong", back_populates="playlist", order_by="PlaylistSong.position")
+
+class PlaylistSong(Base):
+    """
+    One entry of a playlist. Entries are ordered by a sparse position key so
+    that inserting or moving an entry only rewrites that entry's row.
+    """
+    __tablename__ = "playlist_songs"
+    id = Column(Integer, primary_key=True, index=True)
+    playlist_id = Column(Integer, ForeignKey("playlists.id"), nullable=False)
+    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False)
+    position = Column(Integer, nullable=False)
+    added_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_playlist_songs_position", "playlist_id", "position"),
+    )
+
+    # Relationships
+    playlist = relationship("Playlist", back_populates="items")
+    song = relationship("Song", back_populates="playlist_items")
+
+class SongFingerprint(Base):
+    """
+    Acoustic fingerprint of a song: packed 32-bit spectral sub-fingerprints,
+    one per frame.
+    """
+    __tablename__ = "song_fingerprints"
+    song_id = Column(Integer, ForeignKey("songs.id"), primary_key=True)
+    version = Column(Integer, nullable=False, server_default="1")
+    frames = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    song = relationship("Song", back_populates="fingerprint")
+
+class FingerprintHash(Base):
+    """
+    Lookup index entry: one sampled sub-fingerprint of a song and the frame
+    it first occurs at.
+    """
+    __tablename__ = "fingerprint_hashes"
+    id = Column(Integer, primary_key=True, index=True)
+    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False, index=True)
+    value = Column(Integer, nullable=False, index=True)
+    frame = Column(Integer, nullable=False)
+
+class UploadSession(Base):
+    """
+    A resumable upload in progress. Chunks are written into a preallocated
+    file at temp_path; the song fields are applied when the upload completes.
+    Archives for a batch upload have no song fields.
+    """
+    __tablename__ = "upload_sessions"
+    id = Column(String, primary_key=True)
+    filename = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    temp_path = Column(String, nullable=False)
+    title = Column(String, nullable=True)
+    artist = Column(String, nullable=True)
+    album = Column(String, nullable=True)
+    genre = Column(String, nullable=True)
+    year = Column(Integer, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime, nullable=False, index=True)
+
+    # Relationships
+    chunks = relationship("UploadChunk", cascade="all, delete-orphan")
+
+class UploadChunk(Base):
+    """
+    A byte range [offset, offset + length) received for an upload session.
+    Rows are only ever inserted, so parallel chunk uploads don't contend.
+    """
+    __tablename__ = "upload_chunks"
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("upload_sessions.id"), nullable=False, index=True)
+    offset = Column(Integer, nullable=False)
+    length = Column(Integer, nullable=False)
+
+class BatchJob(Base):
+    """
+    A batch upload imported in the background. Its files wait in work_dir
+    until the job runs; results holds a JSON list with one entry per file.
+    """
+    __tablename__ = "batch_jobs"
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done or failed
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    reject_duplicates = Column(Boolean, nullable=False, default=False)
+    work_dir = Column(String, nullable=False)
+    owner = Column(String, nullable=True)  # server process running the job, see batch_job_service.PROCESS_OWNER
+    results = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, index=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class LibraryFile(Base):
+    """
+    What the library scanner last saw for each audio file under uploads/songs,
+    so rescans only re-read files whose size or mtime changed.
+    """
+    __tablename__ = "library_files"
+    path = Column(String, primary_key=True)
+    size = Column(Integer, nullable=False)
+    mtime = Column(Float, nullable=False)
+
+class CatalogVersion(Base):
+    """
+    Single-row counter bumped in the same transaction as every write that
+    changes the song catalog, so caches in any process can tell when they
+    are stale.
+    """
+    __tablename__ = "catalog_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,9 +1,15 @@
 from .song import router as song_router
 from .user import router as user_router
 from .favorites import router as favorites_router
+from .charts import router as charts_router
+from .playlists import router as playlists_router
+from .upload_sessions import router as upload_sessions_router
 
 __all__ = [
     "song_router",
     "user_router", 
-    "favorites_router"
+    "favorites_router",
+    "charts_router",
+    "playlists_router",
+    "upload_sessions_router"
 ] 
\ No newline at end of file
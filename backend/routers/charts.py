@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+
+try:
+    from ..database import get_db
+    from .. import schemas
+    from ..services import chart_service
+except ImportError:
+    from database import get_db
+    import schemas
+    from services import chart_service
+
+router = APIRouter(prefix="/charts", tags=["charts"])
+
+def _validate(period: str, metric: str):
+    if period not in chart_service.PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"period must be one of: {', '.join(chart_service.PERIODS)}"
+        )
+    if metric not in chart_service.METRICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"metric must be one of: {', '.join(chart_service.METRICS)}"
+        )
+
+@router.get("/top-songs", response_model=List[schemas.ChartSongEntry])
+def get_top_songs(
+    period: str = "week",
+    metric: str = "plays",
+    limit: int = 20,
+    db: Session = Depends(get_db)
+):
+    """
+    Most played or most favorited songs for the current day, week or all time.
+    """
+    _validate(period, metric)
+    return chart_service.top_songs(db, period, metric, limit)
+
+@router.get("/top-artists", response_model=List[schemas.ChartArtistEntry])
+def get_top_artists(
+    period: str = "week",
+    metric: str = "plays",
+    limit: int = 20,
+    db: Session = Depends(get_db)
+):
+    """
+    Most played or most favorited artists for the current day, week or all time.
+    """
+    _validate(period, metric)
+    return chart_service.top_artists(db, period, metric, limit)
+
+@router.get("/trending", response_model=List[schemas.TrendingSongEntry])
+def get_trending(limit: int = 20, db: Session = Depends(get_db)):
+    """
+    Songs ranked by time-decayed plays and favorites.
+    """
+    return [
+        {"song": song, "score": score}
+        for song, score in chart_service.trending(db, limit)
+    ]
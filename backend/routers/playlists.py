@@ -0,0 +1,267 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+try:
+    from ..database import get_db
+    from .. import models, schemas
+    from ..services import playlist_service
+except ImportError:
+    from database import get_db
+    import models, schemas
+    from services import playlist_service
+
+router = APIRouter(prefix="/playlists", tags=["playlists"])
+
+def _get_user(db: Session, user_id: int) -> models.User:
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
+
+def _get_playlist(db: Session, playlist_id: int) -> models.Playlist:
+    playlist = db.query(models.Playlist).filter(models.Playlist.id == playlist_id).first()
+    if not playlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Playlist not found"
+        )
+    return playlist
+
+def _get_item(db: Session, playlist_id: int, item_id: int) -> models.PlaylistSong:
+    item = db.query(models.PlaylistSong).filter(
+        models.PlaylistSong.id == item_id,
+        models.PlaylistSong.playlist_id == playlist_id
+    ).first()
+    if not item:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Playlist item not found"
+        )
+    return item
+
+def _anchors(db: Session, playlist_id: int, after_item_id: Optional[int], before_item_id: Optional[int]):
+    if after_item_id is not None and before_item_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give either after_item_id or before_item_id, not both"
+        )
+    after = _get_item(db, playlist_id, after_item_id) if after_item_id is not None else None
+    before = _get_item(db, playlist_id, before_item_id) if before_item_id is not None else None
+    return after, before
+
+def _check_songs(db: Session, song_ids: List[int]):
+    missing = playlist_service.missing_song_ids(db, song_ids)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Songs not found: {missing}"
+        )
+
+def _playlist_response(db: Session, playlist: models.Playlist) -> dict:
+    return {
+        "id": playlist.id,
+        "name": playlist.name,
+        "user_id": playlist.user_id,
+        "kind": playlist.kind,
+        "current_item_id": playlist.current_item_id,
+        "item_count": playlist_service.count_items(db, playlist.id),
+        "created_at": playlist.created_at,
+    }
+
+@router.post("/", response_model=schemas.PlaylistResponse, status_code=status.HTTP_201_CREATED)
+def create_playlist(playlist: schemas.PlaylistCreate, db: Session = Depends(get_db)):
+    """
+    Create an empty playlist.
+    """
+    _get_user(db, playlist.user_id)
+
+    db_playlist = models.Playlist(**playlist.dict(), kind=playlist_service.PLAYLIST_KIND)
+    db.add(db_playlist)
+    db.commit()
+    db.refresh(db_playlist)
+    return _playlist_response(db, db_playlist)
+
+@router.get("/user/{user_id}", response_model=List[schemas.PlaylistResponse])
+def get_user_playlists(user_id: int, db: Session = Depends(get_db)):
+    """
+    Get all playlists of a user (the saved queue is not included).
+    """
+    _get_user(db, user_id)
+
+    playlists = db.query(models.Playlist).filter(
+        models.Playlist.user_id == user_id,
+        models.Playlist.kind == playlist_service.PLAYLIST_KIND
+    ).order_by(models.Playlist.created_at.desc()).all()
+    return [_playlist_response(db, playlist) for playlist in playlists]
+
+@router.get("/queue/{user_id}", response_model=schemas.PlaylistResponse)
+def get_user_queue(user_id: int, db: Session = Depends(get_db)):
+    """
+    Get the user's saved play queue, creating it if needed.
+    Its items are read through /playlists/{id}/items like any playlist.
+    """
+    _get_user(db, user_id)
+    queue = playlist_service.get_or_create_queue(db, user_id)
+    return _playlist_response(db, queue)
+
+@router.put("/queue/{user_id}", response_model=schemas.PlaylistResponse)
+def replace_user_queue(user_id: int, queue_data: schemas.QueueReplace, db: Session = Depends(get_db)):
+    """
+    Replace the user's saved queue with the given songs, in order.
+    This rewrites every item, so clients use it for the first save and send
+    later edits through the item endpoints and position changes through
+    PUT /playlists/{id}.
+    """
+    _get_user(db, user_id)
+    _check_songs(db, queue_data.song_ids)
+    queue = playlist_service.get_or_create_queue(db, user_id)
+
+    playlist_service.clear_items(db, queue.id)
+    items = playlist_service.append_songs(db, queue.id, queue_data.song_ids)
+
+    queue.current_item_id = None
+    if queue_data.current_index is not None and 0 <= queue_data.current_index < len(items):
+        queue.current_item_id = items[queue_data.current_index].id
+
+    db.commit()
+    db.refresh(queue)
+    return _playlist_response(db, queue)
+
+@router.get("/{playlist_id}", response_model=schemas.PlaylistResponse)
+def get_playlist(playlist_id: int, db: Session = Depends(get_db)):
+    """
+    Get a playlist by ID.
+    """
+    return _playlist_response(db, _get_playlist(db, playlist_id))
+
+@router.put("/{playlist_id}", response_model=schemas.PlaylistResponse)
+def update_playlist(
+    playlist_id: int,
+    playlist_update: schemas.PlaylistUpdate,
+    db: Session = Depends(get_db)
+):
+    """
+    Rename a playlist or set its current item.
+    """
+    playlist = _get_playlist(db, playlist_id)
+    update_data = playlist_update.dict(exclude_unset=True)
+    if update_data.get("current_item_id") is not None:
+        _get_item(db, playlist_id, update_data["current_item_id"])
+
+    for field, value in update_data.items():
+        setattr(playlist, field, value)
+
+    db.commit()
+    db.refresh(playlist)
+    return _playlist_response(db, playlist)
+
+@router.delete("/{playlist_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_playlist(playlist_id: int, db: Session = Depends(get_db)):
+    """
+    Delete a playlist and all of its items.
+    """
+    playlist = _get_playlist(db, playlist_id)
+
+    playlist_service.clear_items(db, playlist.id)
+    db.delete(playlist)
+    db.commit()
+
+@router.get("/{playlist_id}/items", response_model=List[schemas.PlaylistItemResponse])
+def get_playlist_items(
+    playlist_id: int,
+    after_position: Optional[int] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """
+    Get playlist items in order. Pass the last item's position as
+    after_position to fetch the next page.
+    """
+    _get_playlist(db, playlist_id)
+    return playlist_service.list_items(db, playlist_id, after_position, limit)
+
+@router.post("/{playlist_id}/items", response_model=schemas.PlaylistItemResponse, status_code=status.HTTP_201_CREATED)
+def add_playlist_item(
+    playlist_id: int,
+    item_data: schemas.PlaylistItemCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Insert a song after or before an existing item, or append it to the end.
+    """
+    _get_playlist(db, playlist_id)
+    _check_songs(db, [item_data.song_id])
+    after, before = _anchors(db, playlist_id, item_data.after_item_id, item_data.before_item_id)
+
+    position = playlist_service.slot_position(db, playlist_id, after=after, before=before)
+    item = models.PlaylistSong(playlist_id=playlist_id, song_id=item_data.song_id, position=position)
+    db.add(item)
+    db.commit()
+    db.refresh(item)
+    return item
+
+@router.post("/{playlist_id}/items/bulk", response_model=schemas.PlaylistBulkAppendResponse, status_code=status.HTTP_201_CREATED)
+def append_playlist_items(
+    playlist_id: int,
+    bulk_data: schemas.PlaylistBulkAppend,
+    db: Session = Depends(get_db)
+):
+    """
+    Append many songs at once: the given song_ids in order, then every song
+    of `album` if one is given. The response lists the new items.
+    """
+    playlist = _get_playlist(db, playlist_id)
+    _check_songs(db, bulk_data.song_ids)
+
+    song_ids = list(bulk_data.song_ids)
+    if bulk_data.album:
+        song_ids += [
+            song_id for (song_id,) in db.query(models.Song.id).filter(
+                models.Song.album == bulk_data.album
+            ).order_by(models.Song.id)
+        ]
+
+    item_ids = [item.id for item in playlist_service.append_songs(db, playlist_id, song_ids)]
+    db.commit()
+    return {**_playlist_response(db, playlist), "items": playlist_service.get_items(db, playlist_id, item_ids)}
+
+@router.put("/{playlist_id}/items/{item_id}/move", response_model=schemas.PlaylistItemResponse)
+def move_playlist_item(
+    playlist_id: int,
+    item_id: int,
+    move_data: schemas.PlaylistItemMove,
+    db: Session = Depends(get_db)
+):
+    """
+    Move an item after or before another item, or to the end.
+    Only the moved item's row is rewritten.
+    """
+    item = _get_item(db, playlist_id, item_id)
+    after, before = _anchors(db, playlist_id, move_data.after_item_id, move_data.before_item_id)
+    if item in (after, before):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot move an item relative to itself"
+        )
+
+    item.position = playlist_service.slot_position(db, playlist_id, after=after, before=before, moving=item)
+    db.commit()
+    db.refresh(item)
+    return item
+
+@router.delete("/{playlist_id}/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
+def remove_playlist_item(playlist_id: int, item_id: int, db: Session = Depends(get_db)):
+    """
+    Remove one item from a playlist.
+    """
+    playlist = _get_playlist(db, playlist_id)
+    item = _get_item(db, playlist_id, item_id)
+
+    if playlist.current_item_id == item.id:
+        playlist.current_item_id = None
+    db.delete(item)
+    db.commit()
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
 from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 import os
 import shutil
@@ -9,11 +10,19 @@ from datetime import datetime
 try:
     from ..database import get_db
     from .. import models, schemas
-    from ..services.file_service import save_upload_file, get_audio_metadata
+    from ..services.file_service import save_upload_file, save_file_object, delete_file
+    from ..services import (
+        batch_job_service, chart_service, facet_service, fingerprint_service, ingest_service,
+        stream_service, upload_session_service
+    )
 except ImportError:
     from database import get_db
     import models, schemas
-    from services.file_service import save_upload_file, get_audio_metadata
+    from services.file_service import save_upload_file, save_file_object, delete_file
+    from services import (
+        batch_job_service, chart_service, facet_service, fingerprint_service, ingest_service,
+        stream_service, upload_session_service
+    )
 
 router = APIRouter(prefix="/songs", tags=["songs"])
 
@@ -23,26 +32,36 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.post("/upload", response_model=schemas.SongResponse, status_code=status.HTTP_201_CREATED)
 async def upload_song(
+    response: Response,
     title: str = Form(...),
     artist: str = Form(...),
     album: Optional[str] = Form(None),
     genre: Optional[str] = Form(None),
     year: Optional[int] = Form(None),
     user_id: Optional[int] = Form(None),
+    reject_duplicates: bool = Form(False),
     file: UploadFile = File(...),
     image: Optional[UploadFile] = File(None),
     db: Session = Depends(get_db)
 ):
     # validation 
-    if not file.filename.lower().endswith(('.mp3', '.ogg', '.wav')):
+    if not file.filename.lower().endswith(ingest_service.AUDIO_EXTENSIONS):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only MP3, OGG, and WAV files are allowed"
         )
     
-    # get file & metadata
+    # Verify user exists (if provided)
+    if user_id:
+        user = db.query(models.User).filter(models.User.id == user_id).first()
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+    
+    # get file
     file_path = await save_upload_file(file, UPLOAD_DIR + '/songs')
-    metadata = await get_audio_metadata(file_path)
 
     # Debug image upload
     print(f"DEBUG: Image parameter received: {image}")
@@ -56,6 +75,57 @@ async def upload_song(
         image_path = None
         print("DEBUG: No image provided")
     
+    # metadata, duplicate check (re-encodes included) and insert
+    song_fields = dict(title=title, artist=artist, album=album, genre=genre, year=year, user_id=user_id)
+    db_song, matches = await run_in_threadpool(
+        ingest_service.ingest_file, db, file_path, song_fields,
+        image_path=image_path, reject_duplicates=reject_duplicates
+    )
+    if not db_song:
+        if image_path:
+            delete_file(image_path)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Song already exists", "matches": matches}
+        )
+    
+    if matches:
+        response.headers["X-Possible-Duplicates"] = ",".join(str(match["song_id"]) for match in matches)
+    
+    return db_song
+
+@router.post("/upload/batch", response_model=schemas.BatchJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_song_batch(
+    user_id: Optional[int] = Form(None),
+    reject_duplicates: bool = Form(False),
+    files: List[UploadFile] = File([]),
+    archive: Optional[UploadFile] = File(None),
+    session_id: Optional[str] = Form(None),
+    metadata: Optional[UploadFile] = File(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload many songs at once, as individual files and/or one ZIP/TAR archive.
+    An archive too large for a single request can be sent with a resumable
+    upload session first and passed as session_id instead.
+    An optional metadata.csv/metadata.json sidecar (uploaded or inside the
+    archive) supplies title, artist, album, genre and year per filename;
+    otherwise file tags are used. Images named like a track, or
+    cover/folder/front images, become cover art.
+    The songs are imported in the background; poll GET /upload/batch/{job_id}
+    for the outcome of each file.
+    """
+    if not files and not archive and not session_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide files, an archive or an upload session"
+        )
+    if archive and session_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either an archive or an upload session, not both"
+        )
+    
     # Verify user exists (if provided)
     if user_id:
         user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -65,26 +135,72 @@ async def upload_song(
                 detail="User not found"
             )
     
-    song_data = schemas.SongCreate(
-        title=title,
-        artist=artist,
-        album=album,
-        genre=genre,
-        year=year,
-        file_path=file_path,
-        file_type=file.filename.split('.')[-1].lower(),
-        file_size=os.path.getsize(file_path),
-        duration=metadata.get('duration'),
-        image_path=image_path,
-        user_id=user_id
-    )
+    session = None
+    if session_id:
+        session = db.query(models.UploadSession).filter(models.UploadSession.id == session_id).first()
+        if not session:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Upload session not found"
+            )
+        if not session.filename.lower().endswith(ingest_service.ARCHIVE_EXTENSIONS):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Upload session is not a ZIP or TAR archive"
+            )
+        upload_status = upload_session_service.session_status(db, session)
+        if not upload_status["complete"]:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Upload is incomplete", "missing": upload_status["missing"]}
+            )
     
-    db_song = models.Song(**song_data.dict())
-    db.add(db_song)
-    db.commit()
-    db.refresh(db_song)
+    try:
+        sidecar = ingest_service.parse_sidecar(metadata.filename, await metadata.read()) if metadata else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    return db_song
+    # Keep the files with the job until it runs
+    batch_job_service.purge_finished_jobs(db)
+    batch_job_service.fail_interrupted_jobs(db)
+    job = batch_job_service.create_job(db, user_id, reject_duplicates)
+    
+    def save_sources():
+        saved = [
+            (upload.filename, save_file_object(upload.file, os.path.basename(upload.filename) or "upload", job.work_dir))
+            for upload in files
+        ]
+        if archive:
+            archive_path = save_file_object(archive.file, os.path.basename(archive.filename) or "archive", job.work_dir)
+            return saved, (archive.filename, archive_path)
+        if session:
+            filename = session.filename
+            return saved, (filename, upload_session_service.finish_session(db, session, job.work_dir))
+        return saved, None
+    
+    try:
+        saved, archive_source = await run_in_threadpool(save_sources)
+    except Exception:
+        batch_job_service.discard_job(db, job)
+        raise
+    batch_job_service.submit_job(job.id, UPLOAD_DIR, saved, archive=archive_source, sidecar=sidecar)
+    return batch_job_service.job_status(job)
+
+@router.get("/upload/batch/{job_id}", response_model=schemas.BatchJobResponse)
+def get_upload_batch(job_id: str, db: Session = Depends(get_db)):
+    """
+    Get a batch upload's status, and once it is done, the outcome of each file.
+    """
+    job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch job not found"
+        )
+    return batch_job_service.job_status(job)
 
 @router.get("/", response_model=List[schemas.SongResponse])
 def get_all_songs(
@@ -93,29 +209,67 @@ def get_all_songs(
     search: Optional[str] = None,
     artist: Optional[str] = None,
     genre: Optional[str] = None,
+    year: Optional[int] = None,
+    file_type: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     Get all songs with optional filtering.
     """
-    query = db.query(models.Song)
-    
-    if search:
-        query = query.filter(
-            models.Song.title.contains(search) | 
-            models.Song.artist.contains(search) |
-            models.Song.album.contains(search)
-        )
-    
-    if artist:
-        query = query.filter(models.Song.artist == artist)
-    
-    if genre:
-        query = query.filter(models.Song.genre == genre)
+    query = facet_service.filter_songs(
+        db.query(models.Song), search,
+        artist=artist or None, genre=genre or None, year=year, file_type=file_type or None
+    )
     
     songs = query.offset(skip).limit(limit).all()
     return songs
 
+@router.get("/facets", response_model=schemas.SongFacets)
+def get_song_facets(
+    search: Optional[str] = None,
+    artist: Optional[str] = None,
+    genre: Optional[str] = None,
+    year: Optional[int] = None,
+    file_type: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    """
+    Get artist, genre, year and file type counts for the songs matching
+    the same filters as the song list, for building browse sidebars.
+    """
+    filters = {
+        "artist": artist or None,
+        "genre": genre or None,
+        "year": year,
+        "file_type": file_type or None,
+    }
+    return facet_service.get_facets(db, search, filters, limit)
+
+@router.get("/manifest", response_model=List[schemas.AudioManifestEntry])
+def get_audio_manifest(ids: List[int] = Query(..., max_length=20), db: Session = Depends(get_db)):
+    """
+    Describe the audio files for upcoming queue items (URL, size, ETag), in
+    the order requested, so the service worker can prefetch them.
+    Songs that don't exist or whose file is missing are left out.
+    """
+    songs = {song.id: song for song in db.query(models.Song).filter(models.Song.id.in_(ids))}
+
+    manifest = []
+    for song_id in ids:
+        song = songs.get(song_id)
+        if not song or not os.path.exists(song.file_path):
+            continue
+        stat_result = os.stat(song.file_path)
+        manifest.append({
+            "song_id": song.id,
+            "url": f"/songs/{song.id}/file",
+            "size": stat_result.st_size,
+            "etag": stream_service.file_etag(stat_result),
+            "media_type": stream_service.AUDIO_MEDIA_TYPES.get(song.file_type, "audio/mpeg"),
+        })
+    return manifest
+
 @router.get("/user/{user_id}", response_model=List[schemas.SongResponse])
 def get_user_songs(
     user_id: int,
@@ -160,10 +314,60 @@ def get_song(song_id: int, db: Session = Depends(get_db)):
         )
     return song
 
+@router.get("/{song_id}/duplicates", response_model=List[schemas.DuplicateMatch])
+def get_song_duplicates(song_id: int, db: Session = Depends(get_db)):
+    """
+    Find likely duplicates of a song by acoustic fingerprint.
+    Songs uploaded before fingerprinting existed, or fingerprinted by an older
+    version, are fingerprinted on first request.
+    """
+    song = db.query(models.Song).filter(models.Song.id == song_id).first()
+    if not song:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Song not found"
+        )
+    
+    fingerprint = fingerprint_service.load_fingerprint(song.fingerprint) if song.fingerprint else None
+    if not fingerprint:
+        fingerprint = fingerprint_service.fingerprint_file(song.file_path)
+        if not fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Audio file could not be fingerprinted"
+            )
+        fingerprint_service.store_fingerprint(db, song.id, fingerprint)
+        db.commit()
+    
+    matches = fingerprint_service.find_matches(db, fingerprint, exclude_song_id=song.id)
+    songs = {
+        match.id: match for match in db.query(models.Song).filter(
+            models.Song.id.in_([m["song_id"] for m in matches])
+        )
+    }
+    return [{**match, "song": songs[match["song_id"]]} for match in matches]
+
+@router.post("/{song_id}/play", status_code=status.HTTP_201_CREATED)
+def record_song_play(song_id: int, db: Session = Depends(get_db)):
+    """
+    Record a play of a song for the charts.
+    """
+    song = db.query(models.Song).filter(models.Song.id == song_id).first()
+    if not song:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Song not found"
+        )
+    
+    chart_service.record_play(db, song)
+    db.commit()
+    
+    return {"message": "Play recorded"}
+
 @router.get("/{song_id}/file")
-def stream_song_file(song_id: int, db: Session = Depends(get_db)):
+def stream_song_file(song_id: int, request: Request, db: Session = Depends(get_db)):
     """
-    Stream audio file for playback.
+    Stream audio file for playback. Supports Range requests for seeking.
     """
     song = db.query(models.Song).filter(models.Song.id == song_id).first()
     if not song:
@@ -178,15 +382,10 @@ def stream_song_file(song_id: int, db: Session = Depends(get_db)):
             detail="Audio file not found"
         )
     
-    mime_types = {
-        "mp3": "audio/mpeg",
-        "ogg": "audio/ogg", 
-        "wav": "audio/wav"
-    }
-    
-    return FileResponse(
+    return stream_service.range_file_response(
+        request,
         song.file_path,
-        media_type=mime_types.get(song.file_type, "audio/mpeg"),
+        media_type=stream_service.AUDIO_MEDIA_TYPES.get(song.file_type, "audio/mpeg"),
         filename=f"{song.title}.{song.file_type}"
     )
 
@@ -225,9 +424,9 @@ def get_song_image(song_id: int, db: Session = Depends(get_db)):
     )
 
 @router.get("/{song_id}/download")
-def download_song_file(song_id: int, db: Session = Depends(get_db)):
+def download_song_file(song_id: int, request: Request, db: Session = Depends(get_db)):
     """
-    Download the audio file.
+    Download the audio file. Supports Range requests for resuming.
     """
     song = db.query(models.Song).filter(models.Song.id == song_id).first()
     if not song:
@@ -242,10 +441,11 @@ def download_song_file(song_id: int, db: Session = Depends(get_db)):
             detail="Audio file not found"
         )
     
-    return FileResponse(
+    return stream_service.range_file_response(
+        request,
         song.file_path,
-        filename=f"{song.title}.{song.file_type}",
-        media_type="application/octet-stream"
+        media_type="application/octet-stream",
+        filename=f"{song.title}.{song.file_type}"
     )
 
 @router.put("/{song_id}", response_model=schemas.SongResponse)
@@ -264,9 +464,14 @@ def update_song(
             detail="Song not found"
         )
     
+    old_artist = song.artist
     for field, value in song_update.dict(exclude_unset=True).items():
         setattr(song, field, value)
     
+    # Keep artist charts in sync with a rename
+    chart_service.move_artist(db, song, old_artist)
+    facet_service.invalidate(db)
+    
     db.commit()
     db.refresh(song)
     return song
@@ -274,7 +479,7 @@ def update_song(
 @router.delete("/{song_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_song(song_id: int, db: Session = Depends(get_db)):
     """
-    Delete a song and its file.
+    Delete a song, its file and its cover image (unless another song uses it).
     """
     song = db.query(models.Song).filter(models.Song.id == song_id).first()
     if not song:
@@ -287,8 +492,19 @@ def delete_song(song_id: int, db: Session = Depends(get_db)):
     if os.path.exists(song.file_path):
         os.remove(song.file_path)
     
+    # Covers from batch uploads can be shared by a whole album
+    if song.image_path:
+        shared = db.query(models.Song.id).filter(
+            models.Song.image_path == song.image_path,
+            models.Song.id != song.id
+        ).first()
+        if not shared:
+            delete_file(song.image_path)
+    
     # Delete the song record
+    chart_service.forget_song(db, song)
     db.delete(song)
+    facet_service.invalidate(db)
     db.commit()
     
     return {"message": "Song deleted successfully"}
@@ -0,0 +1,206 @@
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+
+try:
+    from ..database import get_db
+    from .. import models, schemas
+    from ..services.file_service import save_upload_file, delete_file
+    from ..services import ingest_service, upload_session_service
+except ImportError:
+    from database import get_db
+    import models, schemas
+    from services.file_service import save_upload_file, delete_file
+    from services import ingest_service, upload_session_service
+
+router = APIRouter(prefix="/songs/upload/sessions", tags=["uploads"])
+
+UPLOAD_DIR = "uploads"
+
+def _get_session(db: Session, session_id: str) -> models.UploadSession:
+    session = db.query(models.UploadSession).filter(models.UploadSession.id == session_id).first()
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found"
+        )
+    return session
+
+@router.post("/", response_model=schemas.UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+def create_upload_session(session_data: schemas.UploadSessionCreate, db: Session = Depends(get_db)):
+    """
+    Start a resumable upload. Send the file with PUT /{id}?offset=N in chunks,
+    in any order or in parallel, then POST /{id}/complete. A ZIP/TAR archive
+    is instead imported by passing the session to POST /songs/upload/batch.
+    """
+    filename = session_data.filename.lower()
+    if filename.endswith(ingest_service.AUDIO_EXTENSIONS):
+        if not session_data.title or not session_data.artist:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Title and artist are required"
+            )
+    elif not filename.endswith(ingest_service.ARCHIVE_EXTENSIONS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only MP3, OGG, and WAV files or ZIP/TAR archives are allowed"
+        )
+
+    if not 0 < session_data.size <= upload_session_service.MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File size must be between 1 and {upload_session_service.MAX_UPLOAD_SIZE} bytes"
+        )
+
+    # Verify user exists (if provided)
+    if session_data.user_id:
+        user = db.query(models.User).filter(models.User.id == session_data.user_id).first()
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+
+    # Opportunistic garbage collection of abandoned uploads
+    upload_session_service.purge_stale_sessions(db)
+
+    song_fields = session_data.dict(exclude={"filename", "size"})
+    session = upload_session_service.create_session(db, session_data.filename, session_data.size, song_fields)
+    return upload_session_service.session_status(db, session)
+
+@router.get("/{session_id}", response_model=schemas.UploadSessionResponse)
+def get_upload_session(session_id: str, db: Session = Depends(get_db)):
+    """
+    Get which byte ranges have been received and which are still missing.
+    """
+    session = _get_session(db, session_id)
+    return upload_session_service.session_status(db, session)
+
+@router.put("/{session_id}", response_model=schemas.UploadSessionResponse)
+async def upload_chunk(session_id: str, offset: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Write the raw request body into the upload at the given byte offset.
+    Re-sending a chunk is harmless.
+    """
+    session = await run_in_threadpool(_get_session, db, session_id)
+    if offset < 0 or offset >= session.size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Offset is outside the file"
+        )
+
+    try:
+        f = await run_in_threadpool(open, session.temp_path, "r+b")
+    except FileNotFoundError:
+        # /complete has already taken the file
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload is already being completed"
+        )
+
+    limit = min(session.size - offset, upload_session_service.MAX_CHUNK_SIZE)
+    written = 0
+    buffer = bytearray()
+    try:
+        await run_in_threadpool(f.seek, offset)
+        async for data in request.stream():
+            if written + len(buffer) + len(data) > limit:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Chunk runs past the end of the file or is too large"
+                )
+            buffer += data
+            if len(buffer) >= upload_session_service.WRITE_SIZE:
+                await run_in_threadpool(f.write, buffer)
+                written += len(buffer)
+                buffer = bytearray()
+        await run_in_threadpool(f.write, buffer)
+        written += len(buffer)
+    finally:
+        await run_in_threadpool(f.close)
+
+    recorded = await run_in_threadpool(upload_session_service.record_chunk, db, session, offset, written)
+    if not recorded:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload was completed or cancelled while the chunk was sent"
+        )
+    return await run_in_threadpool(upload_session_service.session_status, db, session)
+
+@router.post("/{session_id}/complete", response_model=schemas.SongResponse, status_code=status.HTTP_201_CREATED)
+async def complete_upload_session(
+    response: Response,
+    session_id: str,
+    reject_duplicates: bool = Form(False),
+    image: Optional[UploadFile] = File(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Finish a fully received upload and add it to the library like a normal
+    upload. The session is only dropped once the song is in the library; if
+    the upload is rejected or fails it can be completed again.
+    """
+    session = _get_session(db, session_id)
+    if not session.filename.lower().endswith(ingest_service.AUDIO_EXTENSIONS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Archives are imported with POST /songs/upload/batch"
+        )
+    upload_status = upload_session_service.session_status(db, session)
+    if not upload_status["complete"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Upload is incomplete", "missing": upload_status["missing"]}
+        )
+
+    song_fields = {
+        field: getattr(session, field)
+        for field in ("title", "artist", "album", "genre", "year", "user_id")
+    }
+    try:
+        file_path = upload_session_service.claim_file(session, UPLOAD_DIR + '/songs')
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload is already being completed"
+        )
+
+    image_path = None
+    try:
+        image_path = await save_upload_file(image, UPLOAD_DIR + '/images') if image else None
+        # Deleted in the same commit that inserts the song
+        db.delete(session)
+        db_song, matches = await run_in_threadpool(
+            ingest_service.ingest_file, db, file_path, song_fields,
+            image_path=image_path, reject_duplicates=reject_duplicates, keep_rejected=True
+        )
+    except Exception:
+        db.rollback()
+        upload_session_service.restore_file(session, file_path)
+        if image_path:
+            delete_file(image_path)
+        raise
+
+    if not db_song:
+        db.rollback()
+        upload_session_service.restore_file(session, file_path)
+        if image_path:
+            delete_file(image_path)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Song already exists", "matches": matches}
+        )
+
+    if matches:
+        response.headers["X-Possible-Duplicates"] = ",".join(str(match["song_id"]) for match in matches)
+
+    return db_song
+
+@router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+def cancel_upload_session(session_id: str, db: Session = Depends(get_db)):
+    """
+    Abandon an upload and delete what was received.
+    """
+    session = _get_session(db, session_id)
+    upload_session_service.discard_session(db, session)
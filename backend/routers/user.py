@@ -5,9 +5,11 @@ from typing import List
 try:
     from ..database import get_db
     from .. import models, schemas
+    from ..services import chart_service
 except ImportError:
     from database import get_db
     import models, schemas
+    from services import chart_service
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -150,8 +152,9 @@ def add_to_favorites(user_id: int, song_id: int, db: Session = Depends(get_db)):
         )
     
     # Add to favorites
-    favorite = models.Favorite(user_id=user_id, song_id=song_id)
+    favorite = models.Favorite(user_id=user_id, song_id=song_id, added_at=chart_service.utcnow())
     db.add(favorite)
+    chart_service.record_favorite(db, song, favorite.added_at)
     db.commit()
     
     return {"message": "Song added to favorites"}
@@ -172,6 +175,7 @@ def remove_from_favorites(user_id: int, song_id: int, db: Session = Depends(get_
             detail="Song not in favorites"
         )
     
+    chart_service.record_unfavorite(db, favorite.song, favorite.added_at)
     db.delete(favorite)
     db.commit()
     
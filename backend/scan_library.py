@@ -0,0 +1,107 @@
+"""
+Reconcile the upload directory with the songs table.
+
+Run from the backend directory:
+
+    python scan_library.py [--upload-dir DIR] [--dry-run] [--remove-orphans] [--user-id N] [--min-age SECONDS]
+                           [--loudness [--reanalyze]] [--fingerprints]
+
+Audio files under uploads/songs without a song are imported, songs whose
+file changed are refreshed, and songs whose file is gone as well as cover
+images no song uses are listed (and deleted with --remove-orphans).
+Files written in the last --min-age seconds may belong to an upload still
+in progress and are left for the next scan.
+With --loudness, songs without loudness data are then measured for
+playback normalization, and with --fingerprints, songs without a current
+fingerprint are fingerprinted for duplicate detection.
+"""
+import argparse
+import time
+
+try:
+    from .database import engine, SessionLocal, migrate_schema
+    from . import models
+    from .services import library_service
+except ImportError:
+    from database import engine, SessionLocal, migrate_schema
+    import models
+    from services import library_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile uploaded files with the song library")
+    parser.add_argument("--upload-dir", default=library_service.UPLOAD_DIR,
+                        help="upload directory (default: %(default)s)")
+    parser.add_argument("--remove-orphans", action="store_true",
+                        help="delete songs whose file is missing and unused cover images")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report what would change without writing anything")
+    parser.add_argument("--user-id", type=int, default=None,
+                        help="owner of newly imported songs")
+    parser.add_argument("--min-age", type=float, default=library_service.MIN_FILE_AGE,
+                        help="skip files modified less than this many seconds ago (default: %(default)s)")
+    parser.add_argument("--loudness", action="store_true",
+                        help="measure loudness for songs that haven't been measured yet")
+    parser.add_argument("--reanalyze", action="store_true",
+                        help="with --loudness, measure every song again")
+    parser.add_argument("--fingerprints", action="store_true",
+                        help="fingerprint songs without a current fingerprint")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    migrate_schema(models.Base.metadata)
+
+    started = time.monotonic()
+    with SessionLocal() as db:
+        report = library_service.scan_library(
+            db,
+            upload_dir=args.upload_dir,
+            remove_orphans=args.remove_orphans,
+            dry_run=args.dry_run,
+            user_id=args.user_id,
+            min_file_age=args.min_age
+        )
+    elapsed = time.monotonic() - started
+
+    print(
+        f"Scanned {report['scanned']} files in {elapsed:.1f}s: "
+        f"{len(report['added'])} added, {len(report['updated'])} updated, "
+        f"{report['unchanged']} unchanged, {len(report['unreadable'])} unreadable"
+    )
+    for path in report["unreadable"]:
+        print(f"  unreadable: {path}")
+    if report["recent"]:
+        print(f"  {len(report['recent'])} recently written files left for the next scan")
+
+    action = "removed" if report["removed_orphans"] else "orphaned"
+    for missing in report["missing_files"]:
+        print(f"  {action} song {missing['song_id']}: file {missing['file_path']} is missing")
+    for path in report["orphan_images"]:
+        print(f"  {action} image: {path}")
+    if (report["missing_files"] or report["orphan_images"]) and not report["removed_orphans"]:
+        print("Run with --remove-orphans to delete them.")
+    if args.dry_run:
+        print("Dry run: nothing was changed.")
+        return
+
+    if args.loudness:
+        started = time.monotonic()
+        with SessionLocal() as db:
+            counts = library_service.analyze_loudness(db, reanalyze=args.reanalyze)
+        print(
+            f"Measured loudness of {counts['measured']} songs in {time.monotonic() - started:.1f}s "
+            f"({counts['failed']} could not be decoded)"
+        )
+
+    if args.fingerprints:
+        started = time.monotonic()
+        with SessionLocal() as db:
+            counts = library_service.refresh_fingerprints(db)
+        print(
+            f"Fingerprinted {counts['fingerprinted']} songs in {time.monotonic() - started:.1f}s "
+            f"({counts['failed']} could not be decoded)"
+        )
+
+
+if __name__ == "__main__":
+    main()
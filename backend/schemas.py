@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Union
 from datetime import datetime
 
 # Song Schemas
@@ -34,6 +34,9 @@ class SongResponse(SongBase):
     image_path: Optional[str] = None
     upload_date: datetime
     user_id: Optional[int] = None
+    loudness: Optional[float] = None  # LUFS
+    peak: Optional[float] = None
+    replay_gain: Optional[float] = None  # dB; players apply it, limited by peak
     
     class Config:
         orm_mode = True
@@ -84,6 +87,142 @@ class FavoriteResponse(FavoriteBase):
         orm_mode = True
 
 
+# Playlist Schemas
+class PlaylistBase(BaseModel):
+    name: str
+
+class PlaylistCreate(PlaylistBase):
+    user_id: int
+
+class PlaylistUpdate(BaseModel):
+    name: Optional[str] = None
+    current_item_id: Optional[int] = None
+
+class PlaylistResponse(PlaylistBase):
+    id: int
+    user_id: int
+    kind: str
+    current_item_id: Optional[int] = None
+    item_count: int = 0
+    created_at: datetime
+    
+    class Config:
+        orm_mode = True
+
+class PlaylistItemCreate(BaseModel):
+    song_id: int
+    after_item_id: Optional[int] = None
+    before_item_id: Optional[int] = None
+
+class PlaylistItemMove(BaseModel):
+    after_item_id: Optional[int] = None
+    before_item_id: Optional[int] = None
+
+class PlaylistBulkAppend(BaseModel):
+    song_ids: List[int] = []
+    album: Optional[str] = None
+
+class PlaylistItemResponse(BaseModel):
+    id: int
+    playlist_id: int
+    song_id: int
+    position: int
+    added_at: datetime
+    song: SongResponse
+    
+    class Config:
+        orm_mode = True
+
+class PlaylistBulkAppendResponse(PlaylistResponse):
+    items: List[PlaylistItemResponse]  # the appended items, in order
+
+class QueueReplace(BaseModel):
+    song_ids: List[int]
+    current_index: Optional[int] = None
+
+# Resumable Upload Schemas
+class UploadSessionCreate(SongBase):
+    # Required for audio files; archives for a batch upload have no song fields
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    filename: str
+    size: int
+    user_id: Optional[int] = None
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    filename: str
+    size: int
+    received: List[List[int]]  # merged [start, end) byte ranges
+    missing: List[List[int]]
+    complete: bool
+    expires_at: datetime
+
+# Batch Upload Schemas
+class BatchUploadItem(BaseModel):
+    filename: str
+    status: str  # 'created', 'duplicate', 'skipped' or 'error'
+    song_id: Optional[int] = None
+    duplicates: List[int] = []
+    error: Optional[str] = None
+
+class BatchJobResponse(BaseModel):
+    id: str
+    status: str  # 'queued', 'running', 'done' or 'failed'
+    created: int
+    duplicates: int  # rejected as duplicates
+    skipped: int  # not audio, image or metadata files
+    failed: int
+    items: List[BatchUploadItem]
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+# Duplicate Detection Schemas
+class DuplicateMatch(BaseModel):
+    song: SongResponse
+    similarity: float
+    kind: str  # 'duplicate' or 'near_match'
+
+# Facet Schemas
+class FacetValue(BaseModel):
+    value: Union[int, str]
+    count: int
+
+class SongFacets(BaseModel):
+    artists: List[FacetValue]
+    genres: List[FacetValue]
+    years: List[FacetValue]
+    file_types: List[FacetValue]
+
+# Audio Prefetch Schemas
+class AudioManifestEntry(BaseModel):
+    song_id: int
+    url: str  # relative to the API root, e.g. /songs/1/file
+    size: int
+    etag: str
+    media_type: str
+
+# Chart Schemas
+class ChartSongEntry(BaseModel):
+    song: SongResponse
+    plays: int
+    favorites: int
+    
+    class Config:
+        orm_mode = True
+
+class ChartArtistEntry(BaseModel):
+    artist: str
+    plays: int
+    favorites: int
+    
+    class Config:
+        orm_mode = True
+
+class TrendingSongEntry(BaseModel):
+    song: SongResponse
+    score: float
 
 # File Upload Schema
 class FileUploadResponse(BaseModel):
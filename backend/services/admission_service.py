@@ -0,0 +1,194 @@
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+# Heavy endpoint classes get a fixed number of concurrent slots and a short
+# bounded wait queue; anything beyond that is turned away with a 503 right
+# away. Their combined slots stay well under the threadpool size (40 by
+# default), which leaves the rest of the pool for cheap metadata routes.
+STREAM_MAX_ACTIVE = 16
+STREAM_MAX_QUEUED = 32
+UPLOAD_MAX_ACTIVE = 4  # uploads, counting each resumable upload session once
+UPLOAD_MAX_QUEUED = 8
+QUEUE_TIMEOUT = 10.0  # seconds a request may wait for a slot
+
+
+class Overloaded(Exception):
+    pass
+
+
+class _SharedSlot:
+    """
+    A slot held on behalf of every in-flight request with the same key.
+    """
+
+    def __init__(self):
+        self.users = 0
+        self.acquired = asyncio.get_running_loop().create_future()
+
+
+class AdmissionLimiter:
+    """
+    Concurrency limit with a bounded wait queue for one class of endpoints.
+    """
+
+    def __init__(self, name: str, max_active: int, max_queued: int, retry_after: int):
+        self.name = name
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.retry_after = retry_after
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_active)
+        self._shared: Dict[str, _SharedSlot] = {}
+
+    @asynccontextmanager
+    async def admit(self, key: Optional[str] = None):
+        """
+        Hold a slot for the duration of the block. Concurrent requests with
+        the same key (the parallel chunks of one upload session) share a
+        single slot, held until the last of them finishes. Raises Overloaded
+        if the wait queue is full or no slot frees up within QUEUE_TIMEOUT.
+        """
+        if key is None:
+            async with self._slot():
+                yield
+            return
+
+        slot = self._shared.get(key)
+        if slot is None:
+            slot = self._shared[key] = _SharedSlot()
+            self._hold_shared(key, slot)
+        slot.users += 1
+        try:
+            # Raises Overloaded if the first request for the key didn't get a slot
+            await asyncio.shield(slot.acquired)
+            yield
+        finally:
+            slot.users -= 1
+            if slot.users == 0 and self._shared.get(key) is slot:
+                del self._shared[key]
+                self._release_shared(slot)
+
+    def _hold_shared(self, key: str, slot: _SharedSlot):
+        async def acquire():
+            try:
+                await self._acquire()
+            except (Overloaded, asyncio.CancelledError):
+                # Later requests for the key start over instead of joining
+                if self._shared.get(key) is slot:
+                    del self._shared[key]
+                slot.acquired.set_exception(Overloaded())
+                return
+            slot.acquired.set_result(None)
+        asyncio.ensure_future(acquire())
+
+    def _release_shared(self, slot: _SharedSlot):
+        if not slot.acquired.done():
+            # Everyone gave up while the slot was still being waited for;
+            # the waiting task releases it as soon as it gets it
+            slot.acquired.add_done_callback(lambda future: self._release_shared(slot))
+        elif slot.acquired.exception() is None:
+            self._release()
+
+    @asynccontextmanager
+    async def _slot(self):
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self):
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded()
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded()
+        finally:
+            self.queued -= 1
+        self.active += 1
+
+    def _release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_active": self.max_active,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "rejected": self.rejected,
+        }
+
+
+LIMITERS = {
+    "stream": AdmissionLimiter("stream", STREAM_MAX_ACTIVE, STREAM_MAX_QUEUED, retry_after=2),
+    "upload": AdmissionLimiter("upload", UPLOAD_MAX_ACTIVE, UPLOAD_MAX_QUEUED, retry_after=10),
+}
+
+# (methods, path pattern, endpoint class); first match wins, unmatched
+# requests are not limited. Requests whose match has a "key" group share
+# one slot per key.
+ROUTE_CLASSES: List[Tuple[Tuple[str, ...], "re.Pattern", str]] = [
+    (("GET",), re.compile(r"^/api/v1/songs/\d+/(file|download)$"), "stream"),
+    (("GET",), re.compile(r"^/uploads/songs/"), "stream"),
+    (("POST",), re.compile(r"^/api/v1/songs/upload(/batch)?$"), "upload"),
+    (("PUT", "POST"), re.compile(r"^/api/v1/songs/upload/sessions/(?P<key>[^/]+)(/complete)?$"), "upload"),
+]
+
+
+def classify(method: str, path: str) -> Tuple[Optional[AdmissionLimiter], Optional[str]]:
+    """
+    The limiter for a request, if any, and the key it shares a slot under.
+    """
+    for methods, pattern, name in ROUTE_CLASSES:
+        match = pattern.match(path) if method in methods else None
+        if match:
+            return LIMITERS[name], match.groupdict().get("key")
+    return None, None
+
+def saturation() -> Dict[str, Dict[str, Any]]:
+    return {name: limiter.snapshot() for name, limiter in LIMITERS.items()}
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware applying LIMITERS to matching requests. The slot is held
+    until the response has been fully sent, so long downloads count for
+    their whole duration.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limiter, key = classify(scope["method"], scope["path"])
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            async with limiter.admit(key):
+                await self.app(scope, receive, send)
+        except Overloaded:
+            response = JSONResponse(
+                status_code=503,
+                content={"error": "Service busy", "message": f"Too many {limiter.name} requests, retry later"},
+                headers={"Retry-After": str(limiter.retry_after)}
+            )
+            await response(scope, receive, send)
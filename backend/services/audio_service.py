@@ -0,0 +1,71 @@
+from typing import Iterator, Optional
+
+import numpy as np
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+def iter_audio(
+    file_path: str,
+    sample_rate: int = 11025,
+    nchannels: int = 1,
+    chunk_frames: Optional[int] = None
+) -> Iterator[np.ndarray]:
+    """
+    Decode an MP3/OGG/WAV/FLAC file incrementally, yielding float32 chunks
+    of samples in [-1, 1] of about chunk_frames frames (one second by
+    default), shaped like decode_audio's result. Only the current chunk is
+    held in memory.
+    """
+    try:
+        import miniaudio
+    except ImportError as e:
+        raise AudioDecodeError("miniaudio is not installed") from e
+
+    empty = True
+    try:
+        stream = miniaudio.stream_file(
+            file_path,
+            output_format=miniaudio.SampleFormat.SIGNED16,
+            nchannels=nchannels,
+            sample_rate=sample_rate,
+            frames_to_read=chunk_frames or sample_rate
+        )
+        for chunk in stream:
+            samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+            if nchannels > 1:
+                samples = samples.reshape(-1, nchannels)
+            empty = False
+            yield samples
+    except (miniaudio.DecodeError, OSError) as e:
+        raise AudioDecodeError(f"Could not decode {file_path}: {e}") from e
+
+    if empty:
+        raise AudioDecodeError(f"No audio in {file_path}")
+
+def decode_audio(
+    file_path: str,
+    sample_rate: int = 11025,
+    nchannels: int = 1,
+    max_seconds: Optional[float] = None
+) -> np.ndarray:
+    """
+    Decode an MP3/OGG/WAV/FLAC file to float32 samples in [-1, 1].
+    Returns shape (frames,) for mono or (frames, nchannels) otherwise.
+    Decoding stops after max_seconds when given.
+    """
+    max_frames = int(max_seconds * sample_rate) if max_seconds else None
+    chunks = []
+    frames = 0
+    for chunk in iter_audio(file_path, sample_rate=sample_rate, nchannels=nchannels):
+        chunks.append(chunk)
+        frames += len(chunk)
+        if max_frames is not None and frames >= max_frames:
+            break
+
+    samples = np.concatenate(chunks)
+    if max_frames is not None:
+        samples = samples[:max_frames]
+    return samples
@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+try:
+    from .. import models
+    from ..database import SessionLocal
+    from .ingest_service import ingest_batch, iter_archive
+except ImportError:
+    import models
+    from database import SessionLocal
+    from services.ingest_service import ingest_batch, iter_archive
+
+# Files of queued jobs wait here, outside uploads/ so they are never served
+JOB_DIR = "batch_jobs"
+JOB_TTL = timedelta(days=7)  # how long finished jobs can be looked up
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _process_key(pid: int) -> Optional[str]:
+    """
+    Boot id, pid and start time of a running process, which together stay
+    unique across pid reuse and restarts. None if no such process is running
+    or there is no /proc to read them from.
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            boot_id = f.read().strip()
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the command name start at field 3; start time is field 22
+            start_time = f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+    return f"{boot_id}:{pid}:{start_time}"
+
+# Recorded on the jobs this process accepts; they run on its executor
+PROCESS_OWNER = _process_key(os.getpid()) or f"nokey:{os.getpid()}:{uuid.uuid4().hex}"
+
+
+def _owner_running(owner: Optional[str]) -> bool:
+    if owner == PROCESS_OWNER:
+        return True
+    if owner is None:
+        return False
+    if owner.startswith("nokey:"):
+        # No way to tell on this platform, so never fail someone else's job
+        return True
+    return _process_key(int(owner.split(":")[1])) == owner
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Jobs run one at a time: each one already spreads its analysis over the
+    process pool, and SQLite has a single writer anyway.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-job")
+    return _executor
+
+def create_job(db: Session, user_id: Optional[int], reject_duplicates: bool) -> models.BatchJob:
+    """
+    Register a queued job with an empty work directory for its files.
+    """
+    job_id = uuid.uuid4().hex
+    work_dir = os.path.join(JOB_DIR, job_id)
+    os.makedirs(work_dir)
+    job = models.BatchJob(
+        id=job_id,
+        status="queued",
+        user_id=user_id,
+        reject_duplicates=reject_duplicates,
+        work_dir=work_dir,
+        owner=PROCESS_OWNER,
+        created_at=datetime.utcnow()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def discard_job(db: Session, job: models.BatchJob):
+    shutil.rmtree(job.work_dir, ignore_errors=True)
+    db.delete(job)
+    db.commit()
+
+def submit_job(
+    job_id: str,
+    upload_dir: str,
+    files: List[Tuple[str, str]],
+    archive: Optional[Tuple[str, str]] = None,
+    sidecar: Optional[Dict[str, Dict[str, Any]]] = None
+):
+    """
+    Queue a job. files and archive are (original filename, path in the
+    job's work directory) pairs.
+    """
+    _get_executor().submit(run_job, job_id, upload_dir, files, archive, sidecar)
+
+def _sources(files: List[Tuple[str, str]], archive: Optional[Tuple[str, str]]) -> Iterator[Tuple[str, BinaryIO]]:
+    for name, path in files:
+        with open(path, "rb") as f:
+            yield name, f
+    if archive:
+        name, path = archive
+        with open(path, "rb") as f:
+            yield from iter_archive(f, name)
+
+def _result_entry(item: Dict[str, Any]) -> Dict[str, Any]:
+    song = item.get("song")
+    return {
+        "filename": item["filename"],
+        "status": item["status"],
+        "song_id": song.id if song is not None else None,
+        "duplicates": item.get("duplicates", []),
+        "error": item.get("error"),
+    }
+
+def run_job(
+    job_id: str,
+    upload_dir: str,
+    files: List[Tuple[str, str]],
+    archive: Optional[Tuple[str, str]],
+    sidecar: Optional[Dict[str, Dict[str, Any]]]
+):
+    """
+    Import a job's files with ingest_batch and record the outcome. Runs on
+    the job executor with its own database session.
+    """
+    with SessionLocal() as db:
+        job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).one()
+        job.status = "running"
+        db.commit()
+
+        try:
+            items = ingest_batch(
+                db, _sources(files, archive), upload_dir,
+                sidecar=sidecar, user_id=job.user_id, reject_duplicates=job.reject_duplicates
+            )
+            job.results = json.dumps([_result_entry(item) for item in items])
+            job.status = "done"
+        except ValueError as e:
+            job.status = "failed"
+            job.error = str(e)
+        except Exception as e:
+            print(f"Batch job {job_id} failed: {e!r}")
+            job.status = "failed"
+            job.error = "Import failed"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+
+def job_status(job: models.BatchJob) -> Dict[str, Any]:
+    """
+    A job's state with per-status counts of its files. Rejected duplicates
+    and skipped (unsupported) files are counted apart from failures.
+    """
+    items = json.loads(job.results) if job.results else []
+    counts = {"created": 0, "duplicate": 0, "skipped": 0, "error": 0}
+    for item in items:
+        counts[item["status"]] += 1
+    return {
+        "id": job.id,
+        "status": job.status,
+        "created": counts["created"],
+        "duplicates": counts["duplicate"],
+        "skipped": counts["skipped"],
+        "failed": counts["error"],
+        "items": items,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+def fail_interrupted_jobs(db: Session) -> int:
+    """
+    Mark queued or running jobs whose server process has exited as failed
+    and drop their files. Jobs of other live processes (other workers) are
+    left alone. Returns the number of jobs failed.
+    """
+    unfinished = db.query(models.BatchJob).filter(models.BatchJob.status.in_(("queued", "running"))).all()
+    interrupted = [job for job in unfinished if not _owner_running(job.owner)]
+    for job in interrupted:
+        job.status = "failed"
+        job.error = "Interrupted by a server restart; upload the batch again"
+        job.finished_at = datetime.utcnow()
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+    db.commit()
+    return len(interrupted)
+
+def purge_finished_jobs(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Forget jobs that finished more than JOB_TTL ago. Returns how many were removed.
+    """
+    cutoff = (now or datetime.utcnow()) - JOB_TTL
+    removed = db.query(models.BatchJob).filter(models.BatchJob.finished_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return removed
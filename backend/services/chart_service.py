@@ -0,0 +1,253 @@
+import math
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, joinedload
+
+try:
+    from .. import models
+except ImportError:
+    import models
+
+# Chart bucket granularities. 'all' is a single bucket holding lifetime totals.
+PERIODS = ("day", "week", "all")
+METRICS = ("plays", "favorites")
+ALL_TIME_BUCKET = datetime(1970, 1, 1)
+
+# Trending: every event contributes weight * 2^((t - TREND_EPOCH) / half-life),
+# so older events lose half their weight every TREND_HALF_LIFE_HOURS.
+TREND_EPOCH = datetime(2024, 1, 1)
+TREND_HALF_LIFE_HOURS = 24.0
+PLAY_WEIGHT = 1.0
+FAVORITE_WEIGHT = 3.0
+
+
+def utcnow() -> datetime:
+    """
+    Naive UTC timestamp, matching what SQLite's CURRENT_TIMESTAMP stores.
+    """
+    return datetime.utcnow()
+
+def bucket_start(period: str, when: datetime) -> datetime:
+    """
+    Return the start of the bucket of the given period containing `when`.
+    """
+    if period == "all":
+        return ALL_TIME_BUCKET
+    day = datetime(when.year, when.month, when.day)
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown chart period: {period}")
+
+def _trend_exponent(when: datetime) -> float:
+    hours = (when - TREND_EPOCH).total_seconds() / 3600.0
+    return hours / TREND_HALF_LIFE_HOURS
+
+def _log2_add(a: Optional[float], b: float) -> float:
+    if a is None:
+        return b
+    hi, lo = max(a, b), min(a, b)
+    return hi + math.log2(1.0 + 2.0 ** (lo - hi))
+
+def _log2_sub(a: float, b: float) -> Optional[float]:
+    # Returns None when the remaining score is (numerically) zero
+    if b >= a:
+        return None
+    remainder = 1.0 - 2.0 ** (b - a)
+    if remainder <= 1e-12:
+        return None
+    return a + math.log2(remainder)
+
+@event.listens_for(Engine, "connect")
+def _register_sql_functions(dbapi_connection, connection_record):
+    # Lets the trend upserts below combine scores inside the UPDATE itself
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function("log2_add", 2, _log2_add, deterministic=True)
+        dbapi_connection.create_function("log2_sub", 2, _log2_sub, deterministic=True)
+
+def _bump_counters(db: Session, model, key: Dict[str, Any], plays: int, favorites: int):
+    # A single INSERT ... ON CONFLICT DO UPDATE, so concurrent requests
+    # bumping the same bucket neither lose updates nor race to insert it
+    stmt = insert(model).values(**key, plays=max(0, plays), favorites=max(0, favorites))
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={
+            "plays": func.max(0, model.plays + plays),
+            "favorites": func.max(0, model.favorites + favorites),
+        }
+    ))
+
+def _bump_song(db: Session, song_id: int, period: str, start: datetime, plays: int, favorites: int):
+    key = {"song_id": song_id, "period": period, "bucket_start": start}
+    _bump_counters(db, models.SongStat, key, plays, favorites)
+
+def _bump_artist(db: Session, artist: str, period: str, start: datetime, plays: int, favorites: int):
+    key = {"artist": artist, "period": period, "bucket_start": start}
+    _bump_counters(db, models.ArtistStat, key, plays, favorites)
+
+def _bump_trend(db: Session, song_id: int, weight: float, when: datetime):
+    contribution = math.log2(abs(weight)) + _trend_exponent(when)
+    if weight > 0:
+        stmt = insert(models.SongTrend).values(song_id=song_id, log_score=contribution)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["song_id"],
+            set_={"log_score": func.log2_add(models.SongTrend.log_score, contribution), "updated_at": func.now()}
+        ))
+        return
+
+    remaining = func.log2_sub(models.SongTrend.log_score, contribution)
+    db.execute(
+        delete(models.SongTrend).where(models.SongTrend.song_id == song_id, remaining.is_(None)),
+        execution_options={"synchronize_session": False}
+    )
+    db.execute(
+        update(models.SongTrend).where(models.SongTrend.song_id == song_id).values(log_score=remaining),
+        execution_options={"synchronize_session": False}
+    )
+
+def _apply(db: Session, song: models.Song, when: datetime, plays: int = 0, favorites: int = 0):
+    for period in PERIODS:
+        start = bucket_start(period, when)
+        _bump_song(db, song.id, period, start, plays, favorites)
+        if song.artist:
+            _bump_artist(db, song.artist, period, start, plays, favorites)
+
+def record_play(db: Session, song: models.Song, when: Optional[datetime] = None):
+    """
+    Count one play of a song in every chart bucket and in its trending score.
+    The caller is responsible for committing.
+    """
+    when = when or utcnow()
+    _apply(db, song, when, plays=1)
+    _bump_trend(db, song.id, PLAY_WEIGHT, when)
+
+def record_favorite(db: Session, song: models.Song, when: datetime):
+    """
+    Count a new favorite; `when` must be the favorite's added_at.
+    """
+    _apply(db, song, when, favorites=1)
+    _bump_trend(db, song.id, FAVORITE_WEIGHT, when)
+
+def record_unfavorite(db: Session, song: models.Song, added_at: Optional[datetime]):
+    """
+    Undo record_favorite for a removed favorite, in the buckets it was counted in.
+    """
+    when = added_at.replace(tzinfo=None) if added_at else utcnow()
+    _apply(db, song, when, favorites=-1)
+    _bump_trend(db, song.id, -FAVORITE_WEIGHT, when)
+
+def move_artist(db: Session, song: models.Song, old_artist: Optional[str]):
+    """
+    Move a song's counters from old_artist to its current artist after a rename.
+    """
+    if old_artist == song.artist:
+        return
+    stats = db.query(models.SongStat).filter(models.SongStat.song_id == song.id).all()
+    for stat in stats:
+        if old_artist:
+            _bump_artist(db, old_artist, stat.period, stat.bucket_start, -stat.plays, -stat.favorites)
+        if song.artist:
+            _bump_artist(db, song.artist, stat.period, stat.bucket_start, stat.plays, stat.favorites)
+
+def forget_song(db: Session, song: models.Song):
+    """
+    Remove a song's contribution from the artist charts before it is deleted.
+    Its own song_stats/song_trends rows go away with the song via cascade.
+    """
+    if not song.artist:
+        return
+    stats = db.query(models.SongStat).filter(models.SongStat.song_id == song.id).all()
+    for stat in stats:
+        _bump_artist(db, song.artist, stat.period, stat.bucket_start, -stat.plays, -stat.favorites)
+
+def top_songs(db: Session, period: str, metric: str, limit: int, when: Optional[datetime] = None) -> List[models.SongStat]:
+    """
+    Read the top songs of the current bucket straight off the (period, bucket_start, metric) index.
+    """
+    column = getattr(models.SongStat, metric)
+    start = bucket_start(period, when or utcnow())
+    return db.query(models.SongStat).options(joinedload(models.SongStat.song)).filter(
+        models.SongStat.period == period,
+        models.SongStat.bucket_start == start,
+        column > 0
+    ).order_by(column.desc()).limit(limit).all()
+
+def top_artists(db: Session, period: str, metric: str, limit: int, when: Optional[datetime] = None) -> List[models.ArtistStat]:
+    """
+    Read the top artists of the current bucket straight off the (period, bucket_start, metric) index.
+    """
+    column = getattr(models.ArtistStat, metric)
+    start = bucket_start(period, when or utcnow())
+    return db.query(models.ArtistStat).filter(
+        models.ArtistStat.period == period,
+        models.ArtistStat.bucket_start == start,
+        column > 0
+    ).order_by(column.desc()).limit(limit).all()
+
+def trending(db: Session, limit: int, when: Optional[datetime] = None) -> List[Tuple[models.Song, float]]:
+    """
+    Return (song, decayed score) pairs, highest score first.
+    """
+    offset = _trend_exponent(when or utcnow())
+    trends = db.query(models.SongTrend).options(joinedload(models.SongTrend.song)).order_by(
+        models.SongTrend.log_score.desc()
+    ).limit(limit).all()
+    return [(trend.song, 2.0 ** (trend.log_score - offset)) for trend in trends]
+
+def rebuild_charts(db: Session):
+    """
+    Recompute all favorite-driven chart tables from the favorites table.
+    Used once to seed the charts for a database that predates them; play
+    counters cannot be recovered since plays were never recorded before.
+    """
+    db.query(models.SongStat).delete()
+    db.query(models.ArtistStat).delete()
+    db.query(models.SongTrend).delete()
+
+    song_counts: Dict[tuple, int] = defaultdict(int)
+    artist_counts: Dict[tuple, int] = defaultdict(int)
+    trend_scores: Dict[int, float] = {}
+
+    rows = db.query(models.Favorite, models.Song).join(
+        models.Song, models.Favorite.song_id == models.Song.id
+    ).all()
+    for favorite, song in rows:
+        when = favorite.added_at.replace(tzinfo=None) if favorite.added_at else utcnow()
+        for period in PERIODS:
+            start = bucket_start(period, when)
+            song_counts[(song.id, period, start)] += 1
+            if song.artist:
+                artist_counts[(song.artist, period, start)] += 1
+        contribution = math.log2(FAVORITE_WEIGHT) + _trend_exponent(when)
+        trend_scores[song.id] = _log2_add(trend_scores.get(song.id), contribution)
+
+    db.add_all(
+        models.SongStat(song_id=song_id, period=period, bucket_start=start, plays=0, favorites=count)
+        for (song_id, period, start), count in song_counts.items()
+    )
+    db.add_all(
+        models.ArtistStat(artist=artist, period=period, bucket_start=start, plays=0, favorites=count)
+        for (artist, period, start), count in artist_counts.items()
+    )
+    db.add_all(
+        models.SongTrend(song_id=song_id, log_score=score)
+        for song_id, score in trend_scores.items()
+    )
+    db.commit()
+
+def ensure_charts_seeded(db: Session):
+    """
+    Seed the chart tables from existing favorites if they have never been populated.
+    """
+    if db.query(models.SongStat.id).first() is not None:
+        return
+    if db.query(models.Favorite.id).first() is None:
+        return
+    rebuild_charts(db)
@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+try:
+    from .. import models
+except ImportError:
+    import models
+
+# Facet dimension name -> Song column
+FACET_COLUMNS = {
+    "artist": models.Song.artist,
+    "genre": models.Song.genre,
+    "year": models.Song.year,
+    "file_type": models.Song.file_type,
+}
+CACHE_SIZE = 256
+
+_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_version: Optional[int] = None
+
+
+def filter_songs(query, search: Optional[str] = None, **filters):
+    """
+    Apply the song list filters: a free-text search over title/artist/album
+    plus exact matches for any facet dimension given in `filters`.
+    """
+    if search:
+        query = query.filter(
+            models.Song.title.contains(search) |
+            models.Song.artist.contains(search) |
+            models.Song.album.contains(search)
+        )
+    for name, value in filters.items():
+        if value is not None:
+            query = query.filter(FACET_COLUMNS[name] == value)
+    return query
+
+def invalidate(db: Session):
+    """
+    Mark cached facet counts stale by bumping the catalog version. Call in
+    the same transaction as any write to the songs table, in any process
+    (e.g. the library scanner); the caller is responsible for committing.
+    """
+    stmt = insert(models.CatalogVersion).values(id=1, version=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={"version": models.CatalogVersion.version + 1}
+    ))
+
+def _catalog_version(db: Session) -> int:
+    version = db.query(models.CatalogVersion.version).filter(models.CatalogVersion.id == 1).scalar()
+    return version or 0
+
+def _count(db: Session, name: str, search: Optional[str], filters: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+    column = FACET_COLUMNS[name]
+    # A dimension's own filter is left out so the other values stay selectable
+    other_filters = {key: value for key, value in filters.items() if key != name}
+    query = filter_songs(db.query(column, func.count(models.Song.id)), search, **other_filters)
+    rows = query.filter(column.isnot(None)).group_by(column).order_by(
+        func.count(models.Song.id).desc(), column
+    ).limit(limit).all()
+    return [{"value": value, "count": count} for value, count in rows]
+
+def get_facets(db: Session, search: Optional[str], filters: Dict[str, Any], limit: int = 50) -> Dict[str, Any]:
+    """
+    Artist/genre/year/file-type value counts for the songs matching the
+    given search and filters, served from cache when the catalog hasn't
+    changed since they were last computed.
+    """
+    global _cache_version
+    key = (search, tuple(sorted(filters.items())), limit)
+    version = _catalog_version(db)
+    with _cache_lock:
+        if version != _cache_version:
+            _cache.clear()
+            _cache_version = version
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    result = {
+        "artists": _count(db, "artist", search, filters, limit),
+        "genres": _count(db, "genre", search, filters, limit),
+        "years": _count(db, "year", search, filters, limit),
+        "file_types": _count(db, "file_type", search, filters, limit),
+    }
+
+    # Only cache counts no catalog write could have raced with: one committed
+    # while they were computed would already have bumped the version
+    current = _catalog_version(db)
+    with _cache_lock:
+        if _cache_version != version or current != version:
+            return result
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -2,40 +2,60 @@ import os
 import shutil
 from pathlib import Path
 from fastapi import UploadFile
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO
 
-async def save_upload_file(upload_file: UploadFile, upload_dir: str) -> str:
+def unique_file_path(filename: str, upload_dir: str) -> str:
     """
-    Save uploaded file to the specified directory.
-    Returns the file path.
+    Pick a path for filename in upload_dir that doesn't exist yet,
+    adding _1, _2, ... to the name if needed.
     """
     # Create upload directory if it doesn't exist
     os.makedirs(upload_dir, exist_ok=True)
     
     # Generate unique filename to avoid conflicts
-    file_extension = Path(upload_file.filename).suffix
-    unique_filename = f"{upload_file.filename}"
+    file_extension = Path(filename).suffix
+    unique_filename = f"{filename}"
     
     # Ensure filename is unique
     counter = 1
     while os.path.exists(os.path.join(upload_dir, unique_filename)):
-        name_without_ext = Path(upload_file.filename).stem
+        name_without_ext = Path(filename).stem
         unique_filename = f"{name_without_ext}_{counter}{file_extension}"
         counter += 1
     
-    file_path = os.path.join(upload_dir, unique_filename)
+    return os.path.join(upload_dir, unique_filename)
+
+def save_file_object(fileobj: BinaryIO, filename: str, upload_dir: str) -> str:
+    """
+    Save a file-like object under a unique name in the specified directory.
+    Returns the file path.
+    """
+    file_path = unique_file_path(filename, upload_dir)
     
     # Save the file
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
+        shutil.copyfileobj(fileobj, buffer)
     
     return file_path
 
+async def save_upload_file(upload_file: UploadFile, upload_dir: str) -> str:
+    """
+    Save uploaded file to the specified directory.
+    Returns the file path.
+    """
+    return save_file_object(upload_file.file, upload_file.filename, upload_dir)
+
 async def get_audio_metadata(file_path: str) -> Dict[str, Any]:
     """
     Extract audio metadata using mutagen (duration, bitrate, format, file size).
     Supports MP3, OGG, WAV.
     """
+    return read_audio_metadata(file_path)
+
+def read_audio_metadata(file_path: str) -> Dict[str, Any]:
+    """
+    Synchronous version of get_audio_metadata, for worker pools.
+    """
     try:
         import mutagen
         from mutagen.mp3 import MP3
@@ -84,6 +104,29 @@ async def get_audio_metadata(file_path: str) -> Dict[str, Any]:
             "error": str(e)
         }
 
+def read_audio_tags(file_path: str) -> Dict[str, Any]:
+    """
+    Read title/artist/album/genre/year tags, if the file has any.
+    Missing tags are left out of the result.
+    """
+    tags = {}
+    try:
+        import mutagen
+        audio = mutagen.File(file_path, easy=True)
+        if not audio or not audio.tags:
+            return tags
+        
+        for field in ("title", "artist", "album", "genre"):
+            values = audio.tags.get(field)
+            if values and values[0].strip():
+                tags[field] = values[0].strip()
+        date = audio.tags.get("date")
+        if date and date[0][:4].isdigit():
+            tags["year"] = int(date[0][:4])
+    except Exception:
+        pass
+    return tags
+
 def delete_file(file_path: str) -> bool:
     """
     Delete a file from the filesystem.
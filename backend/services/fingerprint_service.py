@@ -0,0 +1,268 @@
+from itertools import chain
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+try:
+    from .. import models
+    from .audio_service import AudioDecodeError, decode_audio
+except ImportError:
+    import models
+    from services.audio_service import AudioDecodeError, decode_audio
+
+# Spectral fingerprint in the style of Haitsma & Kalker: one 32-bit
+# sub-fingerprint per frame, each bit the sign of an energy difference
+# between adjacent bands in adjacent frames. Robust to re-encoding and level
+# changes, but not to tempo/pitch changes such as "sped up" edits. Frames
+# overlap by 31/32 as in the paper, so two copies that start a fraction of a
+# hop apart still line up to within a few percent of bit errors.
+SAMPLE_RATE = 5512
+MAX_SECONDS = 90
+FRAME_SIZE = 2048
+HOP_SIZE = FRAME_SIZE // 32
+BAND_EDGES = np.geomspace(300.0, 2000.0, 34)
+FRAMES_PER_BATCH = 1024  # frames per FFT batch, to bound memory
+# Bumped whenever the parameters above change; older fingerprints can't be
+# compared with new ones and are recomputed (see stale_fingerprints)
+FINGERPRINT_VERSION = 2
+
+# Lookup index: about 1 in 2^HASH_SAMPLE_BITS distinct sub-fingerprints of
+# each song, chosen by value so a copy samples the same ones, together with
+# the frame they first occur at. Even noisy copies share dozens of exact
+# sub-fingerprints with the original, unrelated songs next to none, and the
+# frame differences of the shared ones give the alignment.
+HASH_SAMPLE_BITS = 4
+_IGNORED_HASHES = (0, 0xFFFFFFFF)  # silence and other flat frames
+MIN_HASH_MATCHES = 3
+MAX_CANDIDATES = 50  # most shared hashes first
+LOOKUP_BATCH_SIZE = 500  # values per IN (...) query
+
+# Bit error rates between aligned frame sequences
+DUPLICATE_BER = 0.15
+NEAR_MATCH_BER = 0.30
+OFFSET_SLACK = 4  # frames searched either side of the voted alignment
+MIN_OVERLAP_FRAMES = 16
+# The alignment is picked on the first PREFIX_FRAMES (about 6 s) of the
+# overlap, and candidates whose best prefix is above EARLY_REJECT_BER are
+# dropped there; unrelated audio sits near 0.5, far from either threshold
+PREFIX_FRAMES = 512
+EARLY_REJECT_BER = 0.40
+_POPCOUNT = np.array([bin(value).count("1") for value in range(1 << 16)], dtype=np.uint8)
+
+
+class Fingerprint(NamedTuple):
+    frames: np.ndarray  # uint32 sub-fingerprints
+
+
+def _band_matrix() -> np.ndarray:
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / SAMPLE_RATE)
+    band_of_bin = np.digitize(freqs, BAND_EDGES) - 1
+    matrix = np.zeros((len(freqs), len(BAND_EDGES) - 1), dtype=np.float32)
+    valid = (band_of_bin >= 0) & (band_of_bin < matrix.shape[1])
+    matrix[np.nonzero(valid)[0], band_of_bin[valid]] = 1.0
+    return matrix
+
+_BANDS = _band_matrix()
+_WINDOW = np.hanning(FRAME_SIZE).astype(np.float32)
+
+
+def compute_fingerprint(samples: np.ndarray) -> Optional[Fingerprint]:
+    """
+    Fingerprint mono float samples at SAMPLE_RATE. Returns None for clips
+    too short to fingerprint.
+    """
+    if len(samples) < FRAME_SIZE + 2 * HOP_SIZE:
+        return None
+
+    windows = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    energies = np.empty((len(windows), _BANDS.shape[1]), dtype=np.float32)
+    for start in range(0, len(windows), FRAMES_PER_BATCH):
+        spectrum = np.fft.rfft(windows[start:start + FRAMES_PER_BATCH] * _WINDOW, axis=1)
+        energies[start:start + FRAMES_PER_BATCH] = (spectrum.real ** 2 + spectrum.imag ** 2) @ _BANDS
+
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0  # (frames - 1, 32)
+    frames = (bits.astype(np.uint64) << np.arange(32, dtype=np.uint64)).sum(axis=1).astype(np.uint32)
+    return Fingerprint(frames=frames)
+
+def fingerprint_file(file_path: str) -> Optional[Fingerprint]:
+    """
+    Decode and fingerprint an audio file. Returns None if it can't be decoded.
+    """
+    try:
+        samples = decode_audio(file_path, sample_rate=SAMPLE_RATE, max_seconds=MAX_SECONDS)
+    except AudioDecodeError:
+        return None
+    return compute_fingerprint(samples)
+
+def _sampled(frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (values, first frames) of the sampled sub-fingerprints of a sequence
+    (see HASH_SAMPLE_BITS), values ascending.
+    """
+    values, first_frames = np.unique(frames, return_index=True)
+    mixed = (values.astype(np.uint64) * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)
+    keep = (mixed >> np.uint64(32 - HASH_SAMPLE_BITS)) == 0
+    keep &= ~np.isin(values, _IGNORED_HASHES)
+    return values[keep].astype(np.int64), first_frames[keep].astype(np.int64)
+
+def sample_hashes(frames: np.ndarray) -> Dict[int, int]:
+    """
+    {sub-fingerprint: first frame} for the sampled sub-fingerprints of a
+    sequence (see HASH_SAMPLE_BITS).
+    """
+    values, first_frames = _sampled(frames)
+    return dict(zip(values.tolist(), first_frames.tolist()))
+
+def _overlap(a: np.ndarray, b: np.ndarray, shift: int) -> Tuple[np.ndarray, np.ndarray]:
+    x = a[max(-shift, 0):]
+    y = b[max(shift, 0):]
+    length = min(len(x), len(y))
+    return x[:length], y[:length]
+
+def _error_rate(x: np.ndarray, y: np.ndarray) -> float:
+    errors = int(_POPCOUNT[np.bitwise_xor(x, y).view(np.uint16)].sum(dtype=np.int64))
+    return errors / (len(x) * 32.0)
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray, offset: int = 0, reject_above: float = 1.0) -> float:
+    """
+    Fraction of differing bits between two sub-fingerprint sequences, with
+    a[i] aligned to b[i + offset] give or take OFFSET_SLACK frames: the
+    shift with the fewest errors over the first PREFIX_FRAMES is compared
+    in full. If even that prefix is above reject_above, its rate is
+    returned without comparing the rest.
+    """
+    best_shift = None
+    best = 1.0
+    for shift in range(offset - OFFSET_SLACK, offset + OFFSET_SLACK + 1):
+        x, y = _overlap(a, b, shift)
+        if len(x) < MIN_OVERLAP_FRAMES:
+            continue
+        ber = _error_rate(x[:PREFIX_FRAMES], y[:PREFIX_FRAMES])
+        if ber < best:
+            best_shift, best = shift, ber
+    if best_shift is None or best > reject_above:
+        return best
+    return _error_rate(*_overlap(a, b, best_shift))
+
+def store_fingerprint(db: Session, song_id: int, fingerprint: Fingerprint):
+    """
+    Save a song's fingerprint and its lookup hashes, replacing any previous
+    ones. The caller is responsible for committing.
+    """
+    db.query(models.FingerprintHash).filter(models.FingerprintHash.song_id == song_id).delete()
+    db.query(models.SongFingerprint).filter(models.SongFingerprint.song_id == song_id).delete()
+    db.add(models.SongFingerprint(
+        song_id=song_id,
+        version=FINGERPRINT_VERSION,
+        frames=fingerprint.frames.astype("<u4").tobytes()
+    ))
+    db.bulk_insert_mappings(models.FingerprintHash, [
+        {"song_id": song_id, "value": value, "frame": frame}
+        for value, frame in sample_hashes(fingerprint.frames).items()
+    ])
+
+def forget_fingerprints(db: Session, song_ids: List[int]):
+    """
+    Drop the fingerprints and lookup hashes of songs whose audio changed,
+    so duplicate checks stop matching the old audio and
+    stale_fingerprints picks the songs up again. The caller is responsible
+    for committing.
+    """
+    for start in range(0, len(song_ids), LOOKUP_BATCH_SIZE):
+        batch = song_ids[start:start + LOOKUP_BATCH_SIZE]
+        db.query(models.FingerprintHash).filter(
+            models.FingerprintHash.song_id.in_(batch)
+        ).delete(synchronize_session=False)
+        db.query(models.SongFingerprint).filter(
+            models.SongFingerprint.song_id.in_(batch)
+        ).delete(synchronize_session=False)
+
+def load_fingerprint(stored: models.SongFingerprint) -> Optional[Fingerprint]:
+    """
+    Decode a stored fingerprint, or None if it was computed by an older
+    version and has to be recomputed.
+    """
+    if stored.version != FINGERPRINT_VERSION:
+        return None
+    return Fingerprint(frames=np.frombuffer(stored.frames, dtype="<u4"))
+
+def stale_fingerprints(db: Session) -> List[Any]:
+    """
+    (song_id, file_path) of songs without a current fingerprint.
+    """
+    return db.query(models.Song.id, models.Song.file_path).outerjoin(models.SongFingerprint).filter(or_(
+        models.SongFingerprint.song_id.is_(None),
+        models.SongFingerprint.version != FINGERPRINT_VERSION
+    )).all()
+
+def find_matches(db: Session, fingerprint: Fingerprint, exclude_song_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Look up likely duplicates of a fingerprint: candidates are the songs
+    sharing at least MIN_HASH_MATCHES sampled sub-fingerprints (at most
+    MAX_CANDIDATES of them), which are then confirmed by comparing
+    sub-fingerprints at the alignment most shared ones agree on.
+    Returns dicts with song_id, similarity (1 - bit error rate) and kind
+    ('duplicate' or 'near_match'), best match first.
+    """
+    values, first_frames = _sampled(fingerprint.frames)
+    rows = []
+    # Plain DB-API rows on the session's connection: a library with many
+    # copies of a track returns tens of thousands, and wrapping each one in
+    # a SQLAlchemy row costs about as much as the lookup itself. Flush first,
+    # as a query would, so earlier files of the same batch are found
+    db.flush()
+    cursor = db.connection().connection.cursor()
+    try:
+        for start in range(0, len(values), LOOKUP_BATCH_SIZE):
+            batch = values[start:start + LOOKUP_BATCH_SIZE].tolist()
+            sql = (f"SELECT song_id, value, frame FROM {models.FingerprintHash.__tablename__} "
+                   f"WHERE value IN ({', '.join('?' * len(batch))})")
+            if exclude_song_id is not None:
+                sql += " AND song_id != ?"
+                batch.append(exclude_song_id)
+            cursor.execute(sql, batch)
+            rows += cursor.fetchall()
+    finally:
+        cursor.close()
+    if not rows:
+        return []
+
+    # Votes: each shared hash says how far into the song the query starts
+    found = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows))
+    song_ids, found_values, found_frames = found.reshape(-1, 3).T
+    offsets = found_frames - first_frames[np.searchsorted(values, found_values)]
+    candidate_ids, shared = np.unique(song_ids, return_counts=True)
+    enough = shared >= MIN_HASH_MATCHES
+    candidate_ids = candidate_ids[enough][np.argsort(-shared[enough], kind="stable")][:MAX_CANDIDATES].tolist()
+    if not candidate_ids:
+        return []
+
+    # (song, offset) pairs packed into one int64 so counting them is a flat sort
+    pairs, votes = np.unique((song_ids << 32) + (offsets + (1 << 31)), return_counts=True)
+    pairs = pairs[np.lexsort((-votes, pairs >> 32))]  # per song, most votes first
+    pair_songs = pairs >> 32
+    pair_offsets = (pairs & 0xFFFFFFFF) - (1 << 31)
+    first = np.r_[True, pair_songs[1:] != pair_songs[:-1]]
+    best_offsets = dict(zip(pair_songs[first].tolist(), pair_offsets[first].tolist()))
+
+    matches = []
+    candidates = db.query(models.SongFingerprint).filter(
+        models.SongFingerprint.song_id.in_(candidate_ids),
+        models.SongFingerprint.version == FINGERPRINT_VERSION
+    ).all()
+    for candidate in candidates:
+        ber = bit_error_rate(
+            fingerprint.frames, load_fingerprint(candidate).frames,
+            best_offsets[candidate.song_id], reject_above=EARLY_REJECT_BER
+        )
+        if ber < NEAR_MATCH_BER:
+            matches.append({
+                "song_id": candidate.song_id,
+                "similarity": round(1.0 - ber, 4),
+                "kind": "duplicate" if ber < DUPLICATE_BER else "near_match",
+            })
+    matches.sort(key=lambda match: match["similarity"], reverse=True)
+    return matches
@@ -0,0 +1,276 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePosixPath
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+try:
+    from .. import models
+    from .file_service import save_file_object, read_audio_metadata, read_audio_tags, delete_file
+    from . import facet_service, fingerprint_service, loudness_service
+except ImportError:
+    import models
+    from services.file_service import save_file_object, read_audio_metadata, read_audio_tags, delete_file
+    from services import facet_service, fingerprint_service, loudness_service
+
+AUDIO_EXTENSIONS = (".mp3", ".ogg", ".wav")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+SIDECAR_NAMES = ("metadata.csv", "metadata.json")
+# Images with these names cover every track in their directory
+COVER_STEMS = ("cover", "folder", "front")
+SIDECAR_FIELDS = ("title", "artist", "album", "genre", "year")
+MAX_WORKERS = os.cpu_count() or 2
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Shared process pool for CPU-bound audio work (tag parsing, decoding,
+    fingerprinting, loudness). Uses spawn so workers don't inherit the server's threads.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+    return _pool
+
+def analyze_audio_file(file_path: str) -> Dict[str, Any]:
+    """
+    Everything ingest needs from an audio file. Runs in a pool worker.
+    """
+    return {
+        "metadata": read_audio_metadata(file_path),
+        "tags": read_audio_tags(file_path),
+        "fingerprint": fingerprint_service.fingerprint_file(file_path),
+        "loudness": loudness_service.measure_file(file_path),
+    }
+
+def parse_sidecar(filename: str, data: bytes) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse a metadata sidecar into {audio filename: {field: value}}.
+    CSV needs a `filename` column; JSON is either a list of objects with a
+    `filename` key or an object keyed by filename. Raises ValueError if malformed.
+    """
+    try:
+        text = data.decode("utf-8-sig")
+        if filename.lower().endswith(".json"):
+            parsed = json.loads(text)
+            if isinstance(parsed, dict):
+                rows = [{"filename": key, **value} for key, value in parsed.items()]
+            else:
+                rows = list(parsed)
+        else:
+            rows = list(csv.DictReader(io.StringIO(text)))
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error, TypeError) as e:
+        raise ValueError(f"Invalid metadata file {filename}: {e}") from e
+
+    sidecar = {}
+    for row in rows:
+        if not isinstance(row, dict) or not row.get("filename"):
+            raise ValueError(f"Invalid metadata file {filename}: every entry needs a filename")
+        fields = {
+            field: row[field] for field in SIDECAR_FIELDS
+            if row.get(field) not in (None, "")
+        }
+        if "year" in fields:
+            try:
+                fields["year"] = int(fields["year"])
+            except ValueError:
+                del fields["year"]
+        sidecar[PurePosixPath(row["filename"]).name] = fields
+    return sidecar
+
+def iter_archive(fileobj: BinaryIO, filename: str) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    Yield (member name, file object) for each file in a ZIP or TAR archive,
+    one member at a time, without extracting the archive to disk. TAR files
+    are read in stream mode, so each member must be consumed before the next.
+    """
+    try:
+        if filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    with archive.open(info) as member:
+                        yield info.filename, member
+        else:
+            with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+                for info in archive:
+                    if not info.isfile():
+                        continue
+                    yield info.name, archive.extractfile(info)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise ValueError(f"Invalid archive {filename}: {e}") from e
+
+def _song_fields(base: str, sidecar: Dict[str, Any], tags: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {"title": PurePosixPath(base).stem, "artist": "Unknown Artist"}
+    fields.update(tags)
+    fields.update(sidecar)
+    return fields
+
+def ingest_file(
+    db: Session,
+    file_path: str,
+    song_fields: Dict[str, Any],
+    image_path: Optional[str] = None,
+    reject_duplicates: bool = False,
+    keep_rejected: bool = False
+) -> Tuple[Optional[models.Song], List[Dict[str, Any]]]:
+    """
+    Create the song row for one audio file already saved under uploads/songs.
+    song_fields holds title/artist/album/genre/year/user_id. Returns
+    (song, duplicate matches); song is None if the file was rejected as a
+    duplicate, in which case the file has been removed (unless keep_rejected
+    is set). Changes already pending in db are committed with the song.
+    """
+    metadata = read_audio_metadata(file_path)
+    fingerprint = fingerprint_service.fingerprint_file(file_path)
+    loudness = loudness_service.measure_file(file_path) or {}
+    matches = fingerprint_service.find_matches(db, fingerprint) if fingerprint else []
+    if reject_duplicates and any(match["kind"] == "duplicate" for match in matches):
+        if not keep_rejected:
+            delete_file(file_path)
+        return None, matches
+
+    song = models.Song(
+        **song_fields,
+        file_path=file_path,
+        file_type=PurePosixPath(file_path).suffix.lower().lstrip("."),
+        file_size=os.path.getsize(file_path),
+        duration=metadata.get("duration"),
+        image_path=image_path,
+        **loudness
+    )
+    db.add(song)
+    db.flush()
+    if fingerprint:
+        fingerprint_service.store_fingerprint(db, song.id, fingerprint)
+    facet_service.invalidate(db)
+    db.commit()
+    db.refresh(song)
+    return song, matches
+
+def ingest_batch(
+    db: Session,
+    sources: Iterable[Tuple[str, BinaryIO]],
+    upload_dir: str,
+    sidecar: Optional[Dict[str, Dict[str, Any]]] = None,
+    user_id: Optional[int] = None,
+    reject_duplicates: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Import many files in one go. Files are written to the upload directory as
+    they are read, analyzed in parallel on the process pool, then inserted in
+    a single transaction. Returns one result dict per file.
+    Raises ValueError for malformed archives or sidecars (nothing is kept).
+    """
+    songs_dir = os.path.join(upload_dir, "songs")
+    images_dir = os.path.join(upload_dir, "images")
+    pool = get_pool()
+
+    pending = []
+    results = []
+    saved_files = []
+    archive_sidecar: Dict[str, Dict[str, Any]] = {}
+    covers_by_dir: Dict[str, str] = {}
+    images_by_stem: Dict[Tuple[str, str], str] = {}
+
+    try:
+        for name, fileobj in sources:
+            path = PurePosixPath(name)
+            base = path.name
+            extension = path.suffix.lower()
+            if not base or base.startswith(".") or "__MACOSX" in path.parts:
+                continue
+
+            if base.lower() in SIDECAR_NAMES:
+                archive_sidecar.update(parse_sidecar(base, fileobj.read()))
+            elif extension in IMAGE_EXTENSIONS:
+                image_path = save_file_object(fileobj, base, images_dir)
+                saved_files.append(image_path)
+                if path.stem.lower() in COVER_STEMS:
+                    covers_by_dir[str(path.parent)] = image_path
+                else:
+                    images_by_stem[(str(path.parent), path.stem)] = image_path
+            elif extension in AUDIO_EXTENSIONS:
+                file_path = save_file_object(fileobj, base, songs_dir)
+                saved_files.append(file_path)
+                pending.append((name, path, file_path, pool.submit(analyze_audio_file, file_path)))
+            else:
+                results.append({"filename": name, "status": "skipped", "error": "Unsupported file type"})
+
+        # An explicitly uploaded sidecar wins over one found inside the archive
+        archive_sidecar.update(sidecar or {})
+        used_images = set()
+
+        # Wait for every analysis before the first insert, so the database
+        # isn't locked for writes while files are still being decoded
+        analyzed = []
+        for name, path, file_path, future in pending:
+            try:
+                analyzed.append((name, path, file_path, future.result()))
+            except Exception as e:
+                delete_file(file_path)
+                results.append({"filename": name, "status": "error", "error": str(e)})
+
+        for name, path, file_path, analysis in analyzed:
+            fingerprint = analysis["fingerprint"]
+            matches = fingerprint_service.find_matches(db, fingerprint) if fingerprint else []
+            duplicate_ids = [match["song_id"] for match in matches]
+            if reject_duplicates and any(match["kind"] == "duplicate" for match in matches):
+                delete_file(file_path)
+                results.append({"filename": name, "status": "duplicate", "duplicates": duplicate_ids})
+                continue
+
+            image_path = images_by_stem.get((str(path.parent), path.stem)) or covers_by_dir.get(str(path.parent))
+            if image_path:
+                used_images.add(image_path)
+
+            fields = _song_fields(path.name, archive_sidecar.get(path.name, {}), analysis["tags"])
+            song = models.Song(
+                **fields,
+                file_path=file_path,
+                file_type=path.suffix.lower().lstrip("."),
+                file_size=os.path.getsize(file_path),
+                duration=analysis["metadata"].get("duration"),
+                image_path=image_path,
+                user_id=user_id,
+                **(analysis["loudness"] or {})
+            )
+            db.add(song)
+            db.flush()
+            if fingerprint:
+                # Flushed right away so later files in the batch match against it
+                fingerprint_service.store_fingerprint(db, song.id, fingerprint)
+                db.flush()
+            results.append({"filename": name, "status": "created", "song": song, "duplicates": duplicate_ids})
+
+        facet_service.invalidate(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        for file_path in saved_files:
+            delete_file(file_path)
+        raise
+
+    # Drop images that didn't end up attached to any track
+    for image_path in set(covers_by_dir.values()) | set(images_by_stem.values()):
+        if image_path not in used_images:
+            delete_file(image_path)
+
+    return results
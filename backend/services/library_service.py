@@ -0,0 +1,278 @@
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+try:
+    from .. import models
+    from .file_service import read_audio_metadata, read_audio_tags, delete_file
+    from . import chart_service, facet_service, fingerprint_service, loudness_service
+    from .ingest_service import AUDIO_EXTENSIONS, IMAGE_EXTENSIONS, MAX_WORKERS, get_pool
+except ImportError:
+    import models
+    from services.file_service import read_audio_metadata, read_audio_tags, delete_file
+    from services import chart_service, facet_service, fingerprint_service, loudness_service
+    from services.ingest_service import AUDIO_EXTENSIONS, IMAGE_EXTENSIONS, MAX_WORKERS, get_pool
+
+UPLOAD_DIR = "uploads"
+BATCH_SIZE = 500  # rows per IN (...) query
+# Files written (or moved into place) more recently than this may belong to
+# an upload whose song row isn't committed yet, so they wait for the next scan
+MIN_FILE_AGE = 600  # seconds
+
+
+def read_library_file(file_path: str) -> Dict[str, Any]:
+    """
+    Metadata and tags for one audio file. Runs in a pool worker.
+    """
+    return {
+        "metadata": read_audio_metadata(file_path),
+        "tags": read_audio_tags(file_path),
+    }
+
+def walk_files(directory: str, extensions: Tuple[str, ...]) -> Dict[str, Tuple[int, float, float]]:
+    """
+    {path: (size, mtime, ctime)} for every file under directory with one of
+    the given extensions. Hidden files are skipped.
+    """
+    found = {}
+    pending = [directory]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file() and entry.name.lower().endswith(extensions):
+                    stat_result = entry.stat()
+                    found[entry.path] = (stat_result.st_size, stat_result.st_mtime, stat_result.st_ctime)
+    return found
+
+def _batches(items: List[Any]) -> Iterable[List[Any]]:
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start:start + BATCH_SIZE]
+
+def scan_library(
+    db: Session,
+    upload_dir: str = UPLOAD_DIR,
+    remove_orphans: bool = False,
+    dry_run: bool = False,
+    user_id: Optional[int] = None,
+    min_file_age: float = MIN_FILE_AGE
+) -> Dict[str, Any]:
+    """
+    Reconcile the files under upload_dir with the songs table:
+
+    - audio files without a song are read on the process pool and
+      bulk-inserted (title/artist from tags, else the file name)
+    - songs whose file changed get their size and duration refreshed, and
+      their loudness and fingerprint cleared for re-analysis
+    - songs whose file is gone, and images no song uses, are reported,
+      and deleted if remove_orphans is set
+
+    Only files whose size or mtime differ from the library_files manifest
+    are read, so rescans of an unchanged library are cheap. Files touched
+    less than min_file_age seconds ago are left for a later scan. With
+    dry_run nothing is written or deleted. Returns a report dict.
+    """
+    # Paths are compared in the form the upload endpoints store them in,
+    # relative to the working directory, however upload_dir was spelled
+    upload_dir = os.path.relpath(upload_dir)
+    files = walk_files(os.path.join(upload_dir, "songs"), AUDIO_EXTENSIONS)
+    manifest = {
+        path: (size, mtime)
+        for path, size, mtime in db.query(models.LibraryFile.path, models.LibraryFile.size, models.LibraryFile.mtime)
+    }
+    songs = {
+        file_path: (song_id, file_size)
+        for song_id, file_path, file_size in db.query(models.Song.id, models.Song.file_path, models.Song.file_size)
+    }
+
+    new_paths = []
+    changed_paths = []
+    manifest_updates = []
+    recent = []
+    unchanged = 0
+    settled_before = time.time() - min_file_age
+    for path, (size, mtime, ctime) in files.items():
+        seen = manifest.get(path)
+        song = songs.get(path)
+        if seen == (size, mtime):
+            # Unchanged since the last scan (files without a song here
+            # were unreadable then and are skipped until they change)
+            unchanged += 1
+            continue
+        if max(mtime, ctime) > settled_before:
+            # Possibly still being uploaded or ingested
+            recent.append(path)
+            continue
+        manifest_updates.append(path)
+        if song is None:
+            new_paths.append(path)
+        elif seen is not None or song[1] != size:
+            changed_paths.append(path)
+        else:
+            # Uploaded through the API since the last scan; nothing to re-read
+            unchanged += 1
+
+    to_read = new_paths + changed_paths
+    chunksize = max(1, min(64, len(to_read) // (MAX_WORKERS * 4)))
+    analyses = dict(zip(to_read, get_pool().map(read_library_file, to_read, chunksize=chunksize))) if to_read else {}
+
+    added = []
+    unreadable = []
+    new_songs = []
+    for path in new_paths:
+        analysis = analyses[path]
+        if analysis["metadata"].get("error"):
+            unreadable.append(path)
+            continue
+        fields = {"title": Path(path).stem, "artist": "Unknown Artist"}
+        fields.update(analysis["tags"])
+        new_songs.append({
+            **fields,
+            "file_path": path,
+            "file_type": Path(path).suffix.lower().lstrip("."),
+            "file_size": files[path][0],
+            "duration": analysis["metadata"].get("duration"),
+            "user_id": user_id,
+        })
+        added.append(path)
+    db.bulk_insert_mappings(models.Song, new_songs)
+
+    db.bulk_update_mappings(models.Song, [
+        {
+            "id": songs[path][0],
+            "file_size": files[path][0],
+            "duration": analyses[path]["metadata"].get("duration"),
+            # Measured again by the next analyze_loudness run
+            "loudness": None,
+            "peak": None,
+            "replay_gain": None,
+        }
+        for path in changed_paths
+    ])
+    # Fingerprinted again by the next refresh_fingerprints run
+    fingerprint_service.forget_fingerprints(db, [songs[path][0] for path in changed_paths])
+
+    # Bring the manifest in line with what's on disk
+    stale = [path for path in manifest if path not in files]
+    for batch in _batches(stale):
+        db.query(models.LibraryFile).filter(models.LibraryFile.path.in_(batch)).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.LibraryFile, [
+        {"path": path, "size": files[path][0], "mtime": files[path][1]}
+        for path in manifest_updates if path not in manifest
+    ])
+    db.bulk_update_mappings(models.LibraryFile, [
+        {"path": path, "size": files[path][0], "mtime": files[path][1]}
+        for path in manifest_updates if path in manifest
+    ])
+
+    # Orphans in both directions
+    missing = sorted(
+        (song_id, path) for path, (song_id, _) in songs.items()
+        if path not in files and not os.path.exists(path)
+    )
+    # Covers of songs about to be removed count as orphans too
+    dropped_ids = {song_id for song_id, _ in missing} if remove_orphans else set()
+    used_images = {
+        path for song_id, path in db.query(models.Song.id, models.Song.image_path).filter(models.Song.image_path.isnot(None))
+        if song_id not in dropped_ids
+    }
+    orphan_images = sorted(
+        path for path, (_, mtime, ctime) in walk_files(os.path.join(upload_dir, "images"), IMAGE_EXTENSIONS).items()
+        if path not in used_images and max(mtime, ctime) <= settled_before
+    )
+
+    removed = remove_orphans and not dry_run
+    if removed:
+        for batch in _batches([song_id for song_id, _ in missing]):
+            for song in db.query(models.Song).filter(models.Song.id.in_(batch)).all():
+                chart_service.forget_song(db, song)
+                db.delete(song)
+    if new_songs or (removed and missing):
+        facet_service.invalidate(db)
+
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+        if removed:
+            for path in orphan_images:
+                delete_file(path)
+
+    return {
+        "scanned": len(files),
+        "unchanged": unchanged,
+        "recent": sorted(recent),
+        "added": added,
+        "updated": changed_paths,
+        "unreadable": unreadable,
+        "missing_files": [{"song_id": song_id, "file_path": path} for song_id, path in missing],
+        "orphan_images": orphan_images,
+        "removed_orphans": removed,
+    }
+
+def analyze_loudness(db: Session, reanalyze: bool = False) -> Dict[str, int]:
+    """
+    Measure loudness for every song that hasn't been measured yet (or all
+    songs with reanalyze), in parallel on the process pool. Results are
+    committed every BATCH_SIZE songs, so an interrupted run keeps its
+    progress. Returns counts of measured and failed songs.
+    """
+    query = db.query(models.Song.id, models.Song.file_path)
+    if not reanalyze:
+        query = query.filter(models.Song.loudness.is_(None))
+    songs = query.all()
+
+    measured = 0
+    failed = 0
+    updates = []
+    paths = [file_path for _, file_path in songs]
+    results = get_pool().map(loudness_service.measure_file, paths) if songs else []
+    for (song_id, _), result in zip(songs, results):
+        if result:
+            updates.append({"id": song_id, **result})
+            measured += 1
+        else:
+            failed += 1
+        if len(updates) >= BATCH_SIZE:
+            db.bulk_update_mappings(models.Song, updates)
+            db.commit()
+            updates = []
+    db.bulk_update_mappings(models.Song, updates)
+    db.commit()
+
+    return {"measured": measured, "failed": failed}
+
+def refresh_fingerprints(db: Session) -> Dict[str, int]:
+    """
+    Fingerprint every song that has no fingerprint or one from an older
+    FINGERPRINT_VERSION, in parallel on the process pool, so duplicate
+    checks on upload see the whole library. Committed every BATCH_SIZE
+    songs. Returns counts of fingerprinted and failed songs.
+    """
+    songs = fingerprint_service.stale_fingerprints(db)
+
+    fingerprinted = 0
+    failed = 0
+    paths = [file_path for _, file_path in songs]
+    results = get_pool().map(fingerprint_service.fingerprint_file, paths) if songs else []
+    for (song_id, _), fingerprint in zip(songs, results):
+        if fingerprint:
+            fingerprint_service.store_fingerprint(db, song_id, fingerprint)
+            fingerprinted += 1
+        else:
+            failed += 1
+        if (fingerprinted + failed) % BATCH_SIZE == 0:
+            db.commit()
+    db.commit()
+
+    return {"fingerprinted": fingerprinted, "failed": failed}
@@ -0,0 +1,118 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    from .audio_service import AudioDecodeError, iter_audio
+except ImportError:
+    from services.audio_service import AudioDecodeError, iter_audio
+
+# Integrated loudness per ITU-R BS.1770 (K-weighted, gated), expressed as a
+# ReplayGain 2.0 style track gain relative to -18 LUFS.
+SAMPLE_RATE = 48000
+NCHANNELS = 2
+REFERENCE_LOUDNESS = -18.0  # LUFS
+STEP = SAMPLE_RATE // 10  # 100 ms; gating blocks are 4 steps (400 ms, 75% overlap)
+BLOCK_STEPS = 4
+ABSOLUTE_GATE = -70.0  # LUFS
+RELATIVE_GATE = -10.0  # LU below the absolute-gated loudness
+STEPS_PER_BATCH = 100  # ten seconds of audio per decoded chunk and FFT batch, to bound memory
+
+# K-weighting filter at 48 kHz: a high shelf followed by a high pass
+_SHELF = ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585))
+_HIGH_PASS = ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621))
+
+
+def _power_response(b, a, freqs: np.ndarray) -> np.ndarray:
+    z = np.exp(-2j * np.pi * freqs / SAMPLE_RATE)
+    response = (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    return np.abs(response) ** 2
+
+def _bin_weights() -> np.ndarray:
+    """
+    Per-bin weights turning |rfft(step)|^2 into the K-weighted mean square
+    of the step. The filter is applied in the frequency domain, one 100 ms
+    step at a time; its impulse response is a few ms, so edge effects are
+    negligible for loudness.
+    """
+    freqs = np.fft.rfftfreq(STEP, 1.0 / SAMPLE_RATE)
+    weights = _power_response(*_SHELF, freqs) * _power_response(*_HIGH_PASS, freqs)
+    # Parseval for a real FFT: every bin but DC and Nyquist stands for two
+    weights[1:-1] *= 2
+    return weights / (STEP * STEP)
+
+_WEIGHTS = _bin_weights()
+
+
+def _to_lufs(mean_square):
+    return -0.691 + 10 * np.log10(mean_square)
+
+def _step_powers(samples: np.ndarray) -> np.ndarray:
+    """
+    K-weighted mean square of each whole 100 ms step of (frames, channels)
+    samples, summed over channels. A trailing partial step is ignored.
+    """
+    nsteps = len(samples) // STEP
+    powers = np.empty(nsteps)
+    for start in range(0, nsteps, STEPS_PER_BATCH):
+        stop = min(start + STEPS_PER_BATCH, nsteps)
+        steps = samples[start * STEP:stop * STEP].reshape(stop - start, STEP, samples.shape[1])
+        spectrum = np.fft.rfft(steps, axis=1)
+        powers[start:stop] = (spectrum.real ** 2 + spectrum.imag ** 2).sum(axis=2) @ _WEIGHTS
+    return powers
+
+def _gated_loudness(powers: np.ndarray, peak: float) -> Optional[Dict[str, float]]:
+    if len(powers) < BLOCK_STEPS:
+        return None
+
+    blocks = np.convolve(powers, np.full(BLOCK_STEPS, 1.0 / BLOCK_STEPS), mode="valid")
+    with np.errstate(divide="ignore"):
+        block_loudness = _to_lufs(blocks)
+
+    gated = block_loudness > ABSOLUTE_GATE
+    if not gated.any():
+        return None
+    relative_gate = _to_lufs(blocks[gated].mean()) + RELATIVE_GATE
+    gated &= block_loudness > relative_gate
+    loudness = float(_to_lufs(blocks[gated].mean()))
+
+    return {
+        "loudness": round(loudness, 2),
+        "peak": round(peak, 6),
+        "replay_gain": round(REFERENCE_LOUDNESS - loudness, 2),
+    }
+
+def compute_loudness(samples: np.ndarray) -> Optional[Dict[str, float]]:
+    """
+    Integrated loudness (LUFS), sample peak (linear) and track gain (dB)
+    of float samples at SAMPLE_RATE, shaped (frames,) or (frames, channels).
+    Returns None for clips shorter than one gating block or silence.
+    """
+    if samples.ndim == 1:
+        samples = samples[:, np.newaxis]
+    if len(samples) == 0:
+        return None
+    return _gated_loudness(_step_powers(samples), float(np.abs(samples).max()))
+
+def measure_file(file_path: str) -> Optional[Dict[str, float]]:
+    """
+    Measure a whole audio file like compute_loudness, decoding it a chunk
+    at a time so only the step powers of the track are kept in memory.
+    Returns None if it can't be decoded or is silent. The keys match the
+    Song columns, so the result can be applied to a song directly.
+    """
+    powers = []
+    peak = 0.0
+    pending = None  # samples of a step split across chunks
+    try:
+        for chunk in iter_audio(file_path, sample_rate=SAMPLE_RATE, nchannels=NCHANNELS,
+                                chunk_frames=STEP * STEPS_PER_BATCH):
+            peak = max(peak, float(np.abs(chunk).max(initial=0.0)))
+            if pending is not None:
+                chunk = np.concatenate([pending, chunk])
+            whole = len(chunk) // STEP * STEP
+            powers.append(_step_powers(chunk[:whole]))
+            pending = chunk[whole:]
+    except AudioDecodeError:
+        return None
+    return _gated_loudness(np.concatenate(powers), peak)
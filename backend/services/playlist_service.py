@@ -0,0 +1,173 @@
+from typing import Iterable, List, Optional
+
+from sqlalchemy.orm import Session, joinedload
+
+try:
+    from .. import models
+except ImportError:
+    import models
+
+# Items are spaced POSITION_GAP apart, so about 20 inserts can land in the same
+# gap before the playlist has to be renumbered.
+POSITION_GAP = 1 << 20
+QUEUE_KIND = "queue"
+PLAYLIST_KIND = "playlist"
+
+
+class GapExhausted(Exception):
+    pass
+
+
+def _position_between(lower: Optional[int], upper: Optional[int]) -> int:
+    if lower is None and upper is None:
+        return 0
+    if upper is None:
+        return lower + POSITION_GAP
+    if lower is None:
+        return upper - POSITION_GAP
+    if upper - lower < 2:
+        raise GapExhausted()
+    return (lower + upper) // 2
+
+def _items(db: Session, playlist_id: int, exclude_id: Optional[int] = None):
+    query = db.query(models.PlaylistSong).filter(models.PlaylistSong.playlist_id == playlist_id)
+    if exclude_id is not None:
+        query = query.filter(models.PlaylistSong.id != exclude_id)
+    return query
+
+def _next_position(db: Session, playlist_id: int, position: int, exclude_id: Optional[int]) -> Optional[int]:
+    item = _items(db, playlist_id, exclude_id).filter(
+        models.PlaylistSong.position > position
+    ).order_by(models.PlaylistSong.position.asc()).first()
+    return item.position if item else None
+
+def _previous_position(db: Session, playlist_id: int, position: int, exclude_id: Optional[int]) -> Optional[int]:
+    item = _items(db, playlist_id, exclude_id).filter(
+        models.PlaylistSong.position < position
+    ).order_by(models.PlaylistSong.position.desc()).first()
+    return item.position if item else None
+
+def last_position(db: Session, playlist_id: int, exclude_id: Optional[int] = None) -> Optional[int]:
+    item = _items(db, playlist_id, exclude_id).order_by(models.PlaylistSong.position.desc()).first()
+    return item.position if item else None
+
+def rebalance(db: Session, playlist_id: int):
+    """
+    Renumber a playlist's items POSITION_GAP apart, keeping their order.
+    Only needed when repeated inserts have used up a gap.
+    """
+    ids = [
+        item_id for (item_id,) in db.query(models.PlaylistSong.id).filter(
+            models.PlaylistSong.playlist_id == playlist_id
+        ).order_by(models.PlaylistSong.position, models.PlaylistSong.id)
+    ]
+    db.bulk_update_mappings(models.PlaylistSong, [
+        {"id": item_id, "position": (index + 1) * POSITION_GAP}
+        for index, item_id in enumerate(ids)
+    ])
+    db.flush()
+    db.expire_all()
+
+def slot_position(
+    db: Session,
+    playlist_id: int,
+    after: Optional[models.PlaylistSong] = None,
+    before: Optional[models.PlaylistSong] = None,
+    moving: Optional[models.PlaylistSong] = None
+) -> int:
+    """
+    Pick a position right after `after`, right before `before`, or at the end
+    of the playlist when neither is given. `moving` is the item being moved,
+    which is ignored when looking up neighbours.
+    """
+    exclude_id = moving.id if moving else None
+    for _ in range(2):
+        if after is not None:
+            lower = after.position
+            upper = _next_position(db, playlist_id, lower, exclude_id)
+        elif before is not None:
+            upper = before.position
+            lower = _previous_position(db, playlist_id, upper, exclude_id)
+        else:
+            lower = last_position(db, playlist_id, exclude_id)
+            upper = None
+        try:
+            return _position_between(lower, upper)
+        except GapExhausted:
+            rebalance(db, playlist_id)
+    raise GapExhausted()
+
+def append_songs(db: Session, playlist_id: int, song_ids: Iterable[int]) -> List[models.PlaylistSong]:
+    """
+    Append songs to the end of a playlist in one bulk insert.
+    Returns the new items in order.
+    """
+    start = last_position(db, playlist_id)
+    start = start if start is not None else 0
+    mappings = [
+        {"playlist_id": playlist_id, "song_id": song_id, "position": start + (index + 1) * POSITION_GAP}
+        for index, song_id in enumerate(song_ids)
+    ]
+    if not mappings:
+        return []
+    db.bulk_insert_mappings(models.PlaylistSong, mappings)
+    db.flush()
+    # Everything past the old end is new
+    return _items(db, playlist_id).filter(
+        models.PlaylistSong.position > start
+    ).order_by(models.PlaylistSong.position).all()
+
+def clear_items(db: Session, playlist_id: int):
+    db.query(models.PlaylistSong).filter(
+        models.PlaylistSong.playlist_id == playlist_id
+    ).delete(synchronize_session=False)
+
+def list_items(db: Session, playlist_id: int, after_position: Optional[int], limit: int) -> List[models.PlaylistSong]:
+    """
+    One page of a playlist, read as a range scan on (playlist_id, position).
+    """
+    query = _items(db, playlist_id).options(joinedload(models.PlaylistSong.song))
+    if after_position is not None:
+        query = query.filter(models.PlaylistSong.position > after_position)
+    return query.order_by(models.PlaylistSong.position).limit(limit).all()
+
+def get_items(db: Session, playlist_id: int, item_ids: List[int]) -> List[models.PlaylistSong]:
+    """
+    The given items of a playlist in playlist order, looked up in chunks to
+    stay under SQLite's bound-parameter limit.
+    """
+    items = []
+    for i in range(0, len(item_ids), 500):
+        chunk = item_ids[i:i + 500]
+        items += _items(db, playlist_id).options(joinedload(models.PlaylistSong.song)).filter(
+            models.PlaylistSong.id.in_(chunk)
+        ).all()
+    return sorted(items, key=lambda item: item.position)
+
+def count_items(db: Session, playlist_id: int) -> int:
+    return _items(db, playlist_id).count()
+
+def missing_song_ids(db: Session, song_ids: List[int]) -> List[int]:
+    """
+    Return the ids in song_ids that don't exist, checking in chunks to stay
+    under SQLite's bound-parameter limit.
+    """
+    wanted = set(song_ids)
+    found = set()
+    ids = list(wanted)
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        found.update(song_id for (song_id,) in db.query(models.Song.id).filter(models.Song.id.in_(chunk)))
+    return sorted(wanted - found)
+
+def get_or_create_queue(db: Session, user_id: int) -> models.Playlist:
+    queue = db.query(models.Playlist).filter(
+        models.Playlist.user_id == user_id,
+        models.Playlist.kind == QUEUE_KIND
+    ).first()
+    if not queue:
+        queue = models.Playlist(name="Queue", user_id=user_id, kind=QUEUE_KIND)
+        db.add(queue)
+        db.commit()
+        db.refresh(queue)
+    return queue
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import re
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+AUDIO_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "ogg": "audio/ogg",
+    "wav": "audio/wav"
+}
+READ_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """
+    Strong validator for a file's current contents, matching the one
+    Starlette's FileResponse sends.
+    """
+    etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    return '"' + hashlib.md5(etag_base.encode()).hexdigest() + '"'
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `bytes=` header into an inclusive (start, end) pair.
+    Returns None if the header should be ignored (malformed or multi-range)
+    and raises ValueError if the range can't be satisfied.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+def _iter_file(file_path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+def range_file_response(
+    request: Request,
+    file_path: str,
+    media_type: str,
+    filename: Optional[str] = None
+) -> Response:
+    """
+    Serve a file honouring a single Range (and If-Range) header, so players
+    can seek and caches can fetch just the start of a track. Requests
+    without a usable range get the whole file.
+    """
+    stat_result = os.stat(file_path)
+    size = stat_result.st_size
+    etag = file_etag(stat_result)
+    headers = {"Accept-Ranges": "bytes", "ETag": etag}
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            headers.update({
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(length),
+            })
+            if filename:
+                headers["Content-Disposition"] = content_disposition(filename)
+            return StreamingResponse(
+                _iter_file(file_path, start, length),
+                status_code=206,
+                media_type=media_type,
+                headers=headers
+            )
+
+    return FileResponse(
+        file_path,
+        media_type=media_type,
+        filename=filename,
+        headers=headers,
+        stat_result=stat_result
+    )
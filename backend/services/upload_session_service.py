@@ -0,0 +1,146 @@
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+try:
+    from .. import models
+    from .file_service import unique_file_path, delete_file
+except ImportError:
+    import models
+    from services.file_service import unique_file_path, delete_file
+
+# Partial uploads live outside uploads/ so they are never served as static files
+SESSION_DIR = "upload_sessions"
+MAX_UPLOAD_SIZE = 1 << 30  # 1 GB
+MAX_CHUNK_SIZE = 16 << 20  # 16 MB
+WRITE_SIZE = 1 << 20  # chunk bodies are written to disk in pieces of about this size
+SESSION_TTL = timedelta(hours=24)
+
+
+def create_session(db: Session, filename: str, size: int, song_fields: Dict[str, Any]) -> models.UploadSession:
+    """
+    Start a resumable upload: preallocate a file of the final size (sparse
+    where the filesystem allows) so chunks can be written at any offset.
+    """
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    session_id = uuid.uuid4().hex
+    temp_path = os.path.join(SESSION_DIR, f"{session_id}.part")
+    with open(temp_path, "wb") as f:
+        f.truncate(size)
+
+    session = models.UploadSession(
+        id=session_id,
+        filename=os.path.basename(filename),
+        size=size,
+        temp_path=temp_path,
+        updated_at=datetime.utcnow(),
+        **song_fields
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+def record_chunk(db: Session, session: models.UploadSession, offset: int, length: int) -> bool:
+    """
+    Record a received byte range. Returns False, recording nothing, if the
+    session was completed or discarded in the meantime.
+    """
+    touched = db.query(models.UploadSession).filter(
+        models.UploadSession.id == session.id
+    ).update({"updated_at": datetime.utcnow()})
+    if not touched:
+        db.rollback()
+        return False
+    if length > 0:
+        db.add(models.UploadChunk(session_id=session.id, offset=offset, length=length))
+    db.commit()
+    return True
+
+def received_ranges(db: Session, session_id: str) -> List[List[int]]:
+    """
+    Merged [start, end) byte ranges received so far.
+    """
+    chunks = db.query(models.UploadChunk.offset, models.UploadChunk.length).filter(
+        models.UploadChunk.session_id == session_id
+    ).order_by(models.UploadChunk.offset).all()
+
+    ranges: List[List[int]] = []
+    for offset, length in chunks:
+        end = offset + length
+        if ranges and offset <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([offset, end])
+    return ranges
+
+def missing_ranges(ranges: List[List[int]], size: int) -> List[List[int]]:
+    missing = []
+    position = 0
+    for start, end in ranges:
+        if start > position:
+            missing.append([position, start])
+        position = max(position, end)
+    if position < size:
+        missing.append([position, size])
+    return missing
+
+def session_status(db: Session, session: models.UploadSession) -> Dict[str, Any]:
+    received = received_ranges(db, session.id)
+    missing = missing_ranges(received, session.size)
+    return {
+        "id": session.id,
+        "filename": session.filename,
+        "size": session.size,
+        "received": received,
+        "missing": missing,
+        "complete": not missing,
+        "expires_at": session.updated_at + SESSION_TTL,
+    }
+
+def claim_file(session: models.UploadSession, upload_dir: str) -> str:
+    """
+    Move the assembled file into upload_dir, leaving the session in place
+    until the caller is done with it. Returns the file's new path. Raises
+    FileNotFoundError if another request already claimed it.
+    """
+    file_path = unique_file_path(session.filename, upload_dir)
+    shutil.move(session.temp_path, file_path)
+    return file_path
+
+def restore_file(session: models.UploadSession, file_path: str):
+    """
+    Undo claim_file, so the upload can be completed again.
+    """
+    if os.path.exists(file_path):
+        shutil.move(file_path, session.temp_path)
+
+def finish_session(db: Session, session: models.UploadSession, upload_dir: str) -> str:
+    """
+    Move the assembled file into upload_dir and drop the session.
+    Returns the file's new path.
+    """
+    file_path = claim_file(session, upload_dir)
+    db.delete(session)
+    db.commit()
+    return file_path
+
+def discard_session(db: Session, session: models.UploadSession):
+    delete_file(session.temp_path)
+    db.delete(session)
+    db.commit()
+
+def purge_stale_sessions(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Delete sessions that haven't received data within SESSION_TTL, along with
+    their partial files. Returns the number of sessions removed.
+    """
+    cutoff = (now or datetime.utcnow()) - SESSION_TTL
+    stale = db.query(models.UploadSession).filter(models.UploadSession.updated_at < cutoff).all()
+    for session in stale:
+        discard_session(db, session)
+    return len(stale)
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from services import admission_service
+from services.admission_service import AdmissionLimiter, Overloaded
+
+
+async def _hold(limiter, release, key=None):
+    async with limiter.admit(key):
+        await release.wait()
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_full_queue_is_rejected_right_away():
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_active=1, max_queued=1, retry_after=1)
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(_hold(limiter, release))
+        waiter = asyncio.ensure_future(_hold(limiter, release))
+        await _settle()
+        assert (limiter.active, limiter.queued) == (1, 1)
+
+        with pytest.raises(Overloaded):
+            async with limiter.admit():
+                pass
+        assert limiter.rejected == 1
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert (limiter.active, limiter.queued) == (0, 0)
+
+    asyncio.run(scenario())
+
+def test_wait_times_out(monkeypatch):
+    monkeypatch.setattr(admission_service, "QUEUE_TIMEOUT", 0.01)
+
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_active=1, max_queued=1, retry_after=1)
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(_hold(limiter, release))
+        await _settle()
+        with pytest.raises(Overloaded):
+            async with limiter.admit():
+                pass
+        assert (limiter.queued, limiter.rejected) == (0, 1)
+        release.set()
+        await holder
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_active=1, max_queued=1, retry_after=1)
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(_hold(limiter, release))
+        waiter = asyncio.ensure_future(_hold(limiter, release))
+        await _settle()
+        waiter.cancel()
+        await _settle()
+        assert (limiter.active, limiter.queued) == (1, 0)
+
+        release.set()
+        await holder
+        assert limiter.active == 0
+        # The slot is free again, not leaked to the cancelled request
+        async with limiter.admit():
+            assert limiter.active == 1
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+def test_requests_with_one_key_share_a_slot():
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_active=1, max_queued=0, retry_after=1)
+        release = asyncio.Event()
+        chunks = [asyncio.ensure_future(_hold(limiter, release, key="session")) for _ in range(3)]
+        await _settle()
+        assert limiter.active == 1
+
+        with pytest.raises(Overloaded):
+            async with limiter.admit("other"):
+                pass
+
+        release.set()
+        await asyncio.gather(*chunks)
+        assert limiter.active == 0
+        async with limiter.admit("other"):
+            assert limiter.active == 1
+
+    asyncio.run(scenario())
+
+def test_cancelled_shared_waiters_release_the_slot():
+    async def scenario():
+        limiter = AdmissionLimiter("test", max_active=1, max_queued=1, retry_after=1)
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(_hold(limiter, release))
+        await _settle()
+        chunks = [asyncio.ensure_future(_hold(limiter, release, key="session")) for _ in range(2)]
+        await _settle()
+        assert limiter.queued == 1
+        for chunk in chunks:
+            chunk.cancel()
+        await _settle()
+
+        # The slot the session was waiting for is handed back once it comes free
+        release.set()
+        await holder
+        await _settle()
+        assert (limiter.active, limiter.queued) == (0, 0)
+        async with limiter.admit("session"):
+            assert limiter.active == 1
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from services.loudness_service import REFERENCE_LOUDNESS, SAMPLE_RATE, compute_loudness
+
+
+def _sine(dbfs, seconds, channels=2, freq=1000.0):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = (10 ** (dbfs / 20) * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+    return np.repeat(tone[:, np.newaxis], channels, axis=1)
+
+
+@pytest.mark.parametrize("dbfs", [-23.0, -33.0, -6.0])
+def test_stereo_1khz_sine_reads_its_level(dbfs):
+    # The BS.1770 / EBU Tech 3341 reference: a 1 kHz sine at -23 dBFS in
+    # both channels measures -23 LUFS
+    result = compute_loudness(_sine(dbfs, 20))
+    assert result["loudness"] == pytest.approx(dbfs, abs=0.1)
+    assert result["replay_gain"] == pytest.approx(REFERENCE_LOUDNESS - dbfs, abs=0.1)
+    assert result["peak"] == pytest.approx(10 ** (dbfs / 20), rel=1e-3)
+
+def test_mono_counts_one_channel():
+    result = compute_loudness(_sine(-23.0, 20, channels=1)[:, 0])
+    assert result["loudness"] == pytest.approx(-23.0 - 10 * np.log10(2), abs=0.1)
+
+def test_quiet_passages_are_gated_out():
+    # 30 LU below the rest: under the relative gate, so it doesn't pull the
+    # integrated loudness down
+    samples = np.concatenate([_sine(-23.0, 10), _sine(-53.0, 10)])
+    assert compute_loudness(samples)["loudness"] == pytest.approx(-23.0, abs=0.1)
+
+    # 6 LU below: above the gate, so both halves count
+    samples = np.concatenate([_sine(-23.0, 10), _sine(-29.0, 10)])
+    expected = 10 * np.log10((10 ** (-23.0 / 10) + 10 ** (-29.0 / 10)) / 2)
+    assert compute_loudness(samples)["loudness"] == pytest.approx(expected, abs=0.1)
+
+def test_silence_and_short_clips_have_no_loudness():
+    assert compute_loudness(np.zeros((SAMPLE_RATE * 5, 2), dtype=np.float32)) is None
+    # Below the -70 LUFS absolute gate
+    assert compute_loudness(_sine(-80.0, 5)) is None
+    # Shorter than one 400 ms gating block
+    assert compute_loudness(_sine(-23.0, 0.3)) is None
+    assert compute_loudness(np.zeros((0, 2), dtype=np.float32)) is None
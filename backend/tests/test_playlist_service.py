@@ -0,0 +1,67 @@
+import models
+from services import playlist_service
+from services.playlist_service import POSITION_GAP
+
+
+def _playlist(db):
+    playlist = models.Playlist(name="Test", user_id=1, kind=playlist_service.PLAYLIST_KIND)
+    db.add(playlist)
+    db.flush()
+    return playlist
+
+def _insert(db, playlist, song_id, **neighbours):
+    item = models.PlaylistSong(
+        playlist_id=playlist.id, song_id=song_id,
+        position=playlist_service.slot_position(db, playlist.id, **neighbours)
+    )
+    db.add(item)
+    db.flush()
+    return item
+
+def _song_order(db, playlist):
+    items = db.query(models.PlaylistSong).filter(
+        models.PlaylistSong.playlist_id == playlist.id
+    ).order_by(models.PlaylistSong.position).all()
+    positions = [item.position for item in items]
+    assert len(set(positions)) == len(positions)
+    return [item.song_id for item in items]
+
+
+def test_append_songs_returns_new_items_in_order(db):
+    playlist = _playlist(db)
+    playlist_service.append_songs(db, playlist.id, [1, 2])
+    added = playlist_service.append_songs(db, playlist.id, [3, 4, 5])
+    assert [item.song_id for item in added] == [3, 4, 5]
+    assert [item.position for item in added] == [3 * POSITION_GAP, 4 * POSITION_GAP, 5 * POSITION_GAP]
+    assert playlist_service.append_songs(db, playlist.id, []) == []
+
+def test_repeated_inserts_after_one_item_rebalance(db):
+    playlist = _playlist(db)
+    first, last = playlist_service.append_songs(db, playlist.id, [1, 2])
+    # Each insert halves the gap after `first`, so it runs out after about 20
+    for song_id in range(100, 140):
+        _insert(db, playlist, song_id, after=first)
+
+    assert _song_order(db, playlist) == [1] + list(range(139, 99, -1)) + [2]
+    # The playlist was renumbered along the way, so `last` moved up
+    assert last.position > 2 * POSITION_GAP
+
+def test_repeated_inserts_before_one_item_rebalance(db):
+    playlist = _playlist(db)
+    first, last = playlist_service.append_songs(db, playlist.id, [1, 2])
+    for song_id in range(100, 140):
+        _insert(db, playlist, song_id, before=last)
+
+    assert _song_order(db, playlist) == [1] + list(range(100, 140)) + [2]
+
+def test_moving_items_to_the_same_place_rebalances(db):
+    playlist = _playlist(db)
+    items = playlist_service.append_songs(db, playlist.id, [1, 2, 3, 4])
+    order = [1, 2, 3, 4]
+    # Rotate: the last item keeps moving to right after the first one
+    for _ in range(40):
+        moving = max(items, key=lambda item: item.position)
+        moving.position = playlist_service.slot_position(db, playlist.id, after=items[0], moving=moving)
+        db.flush()
+        order.insert(1, order.pop())
+        assert _song_order(db, playlist) == order
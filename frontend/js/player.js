@@ -4,6 +4,10 @@ let isPlaying = false;
 let isMuted = false;
 let previousVolume = 70;
 
+// Loudness normalization: a Web Audio gain stage, created on first play
+let audioContext = null;
+let normalizationGain = null;
+
 // DOM elements
 let audioPlayer = null;
 let playButton = null;
@@ -544,6 +548,53 @@ function createTrendingSongItem(song) {
 }
 
 // Audio Player Functions
+
+/**
+ * Route the player through a gain node so songs can be normalized.
+ * Must first run from a user gesture (browsers keep audio contexts
+ * suspended until then); without Web Audio, songs play unnormalized.
+ */
+function setupNormalization() {
+    if (audioContext) {
+        if (audioContext.state === 'suspended') {
+            audioContext.resume();
+        }
+        return;
+    }
+
+    const AudioContextClass = window.AudioContext || window.webkitAudioContext;
+    if (!AudioContextClass) return;
+
+    try {
+        audioContext = new AudioContextClass();
+        normalizationGain = audioContext.createGain();
+        audioContext.createMediaElementSource(audioPlayer)
+            .connect(normalizationGain)
+            .connect(audioContext.destination);
+    } catch (error) {
+        console.error('Loudness normalization unavailable:', error);
+        audioContext = null;
+        normalizationGain = null;
+    }
+}
+
+/**
+ * Apply the song's ReplayGain-style gain, measured by the backend,
+ * without pushing its loudest sample past full scale
+ */
+function applySongGain(song) {
+    if (!normalizationGain) return;
+
+    let gain = 1;
+    if (typeof song.replay_gain === 'number') {
+        gain = Math.pow(10, song.replay_gain / 20);
+        if (song.peak > 0) {
+            gain = Math.min(gain, 1 / song.peak);
+        }
+    }
+    normalizationGain.gain.setValueAtTime(gain, audioContext.currentTime);
+}
+
 async function playSong(song) {
     try {
         // Show loading state
@@ -560,6 +611,10 @@ async function playSong(song) {
         const audioUrl = `${window.API_BASE_URL}/songs/${song.id}/file`;
         audioPlayer.src = audioUrl;
         
+        // Level-match the song with the gain measured by the backend
+        setupNormalization();
+        applySongGain(song);
+        
         // Update player info
         updatePlayerInfo(song);
         
@@ -580,7 +635,11 @@ async function playSong(song) {
         
         // Update favorite button state
         updatePlayerFavoriteButton();
-        
+
+        // Count the play for the charts (fire and forget)
+        fetch(`${window.API_BASE_URL}/songs/${song.id}/play`, { method: 'POST' })
+            .catch(error => console.error('Error recording play:', error));
+
         // Show success notification
         if (window.showNotification) {
             window.showNotification(`Now playing: ${song.title}`, 'success', 2000);
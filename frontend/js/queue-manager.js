@@ -8,12 +8,215 @@ class QueueManager {
         this.shuffledQueue = [];
         this.modal = document.getElementById('queue-modal');
         this.queueList = document.getElementById('queue-list');
+        this.saveTimer = null;
+        this.saveChain = Promise.resolve();
+        // Server copy of the queue, so saves can send just what changed:
+        // { userId, id, items: [{ id, songId }], currentItemId }
+        this.savedQueue = null;
+        this.maxEditRequests = 20;
+        this.prefetchCount = 3;
+        this.lastPrefetch = null;
         this.init();
     }
 
     init() {
         this.setupEventListeners();
         this.updateQueueDisplay();
+        this.restoreQueue();
+    }
+
+    /**
+     * Get the logged-in user's ID, or null
+     */
+    getUserId() {
+        if (window.userService && window.userService.isAuthenticated()) {
+            return window.userService.getUserId();
+        }
+        return null;
+    }
+
+    /**
+     * Load the user's saved queue from the server
+     */
+    async restoreQueue() {
+        const userId = this.getUserId();
+        if (!userId || this.queue.length > 0) return;
+
+        try {
+            const queueResponse = await fetch(`${window.API_BASE_URL}/playlists/queue/${userId}`);
+            if (!queueResponse.ok) return;
+            const savedQueue = await queueResponse.json();
+
+            let items = [];
+            if (savedQueue.item_count > 0) {
+                const itemsResponse = await fetch(
+                    `${window.API_BASE_URL}/playlists/${savedQueue.id}/items?limit=${savedQueue.item_count}`
+                );
+                if (!itemsResponse.ok) return;
+                items = await itemsResponse.json();
+            }
+            this.savedQueue = {
+                userId,
+                id: savedQueue.id,
+                items: items.map(item => this.toSavedItem(item)),
+                currentItemId: savedQueue.current_item_id
+            };
+
+            // Don't clobber songs queued while we were loading
+            if (this.queue.length > 0 || items.length === 0) return;
+
+            this.queue = items.map(item => item.song);
+            const currentIndex = items.findIndex(item => item.id === savedQueue.current_item_id);
+            this.currentIndex = Math.max(0, currentIndex);
+            this.updateShuffledQueue();
+            this.updateQueueDisplay();
+            this.updateQueueButton();
+        } catch (error) {
+            console.error('Error restoring queue:', error);
+        }
+    }
+
+    /**
+     * Queue contents to persist: song IDs in play order plus the current position
+     */
+    getSaveState() {
+        const currentSong = this.getCurrentSong();
+        const currentIndex = currentSong ? this.queue.indexOf(currentSong) : -1;
+        return {
+            song_ids: this.queue.map(song => song.id),
+            current_index: currentIndex >= 0 ? currentIndex : null
+        };
+    }
+
+    toSavedItem(item) {
+        return { id: item.id, songId: item.song_id };
+    }
+
+    /**
+     * Send a JSON request to the API, throwing if it fails
+     */
+    async queueRequest(path, method = 'GET', body = undefined) {
+        const options = { method };
+        if (body !== undefined) {
+            options.headers = {
+                'Content-Type': 'application/json',
+            };
+            options.body = JSON.stringify(body);
+        }
+        const response = await fetch(`${window.API_BASE_URL}${path}`, options);
+        if (!response.ok) {
+            throw new Error(`${method} ${path} failed with status ${response.status}`);
+        }
+        return response.status === 204 ? null : response.json();
+    }
+
+    /**
+     * Save the queue to the server, debounced so bursts of edits are sent
+     * together, and one save at a time
+     */
+    scheduleSave() {
+        const userId = this.getUserId();
+        if (!userId) return;
+
+        clearTimeout(this.saveTimer);
+        this.saveTimer = setTimeout(() => {
+            this.saveChain = this.saveChain.then(() => this.saveQueue(userId));
+        }, 1000);
+    }
+
+    async saveQueue(userId) {
+        const saved = this.savedQueue && this.savedQueue.userId === userId ? this.savedQueue : null;
+        try {
+            if (saved) {
+                await this.syncSavedQueue(saved, this.getSaveState());
+            } else {
+                await this.replaceSavedQueue(userId, this.getSaveState());
+            }
+        } catch (error) {
+            console.error('Error saving queue:', error);
+            if (saved) {
+                // The server copy may differ from ours now; replace it wholesale
+                this.savedQueue = null;
+                this.scheduleSave();
+            }
+        }
+    }
+
+    /**
+     * Replace the whole saved queue; used when we don't know what the server has
+     */
+    async replaceSavedQueue(userId, state) {
+        const queue = await this.queueRequest(`/playlists/queue/${userId}`, 'PUT', state);
+        const items = state.song_ids.length > 0
+            ? await this.queueRequest(`/playlists/${queue.id}/items?limit=${state.song_ids.length}`)
+            : [];
+        this.savedQueue = {
+            userId,
+            id: queue.id,
+            items: items.map(item => this.toSavedItem(item)),
+            currentItemId: queue.current_item_id
+        };
+    }
+
+    /**
+     * Bring the saved queue in line with `state` using the item endpoints:
+     * songs removed or inserted since the last save become one request each
+     * (a run appended at the end is one bulk request), and a new position is
+     * a single playlist update. Large rewrites fall back to a full replace.
+     */
+    async syncSavedQueue(saved, state) {
+        const items = saved.items;
+        const songIds = state.song_ids;
+
+        // The edit is whatever lies between the unchanged head and tail
+        let start = 0;
+        while (start < items.length && start < songIds.length && items[start].songId === songIds[start]) {
+            start++;
+        }
+        let oldEnd = items.length;
+        let newEnd = songIds.length;
+        while (oldEnd > start && newEnd > start && items[oldEnd - 1].songId === songIds[newEnd - 1]) {
+            oldEnd--;
+            newEnd--;
+        }
+        const removed = items.slice(start, oldEnd);
+        const added = songIds.slice(start, newEnd);
+        const bulkAppend = oldEnd === items.length && added.length > 1;
+
+        if (removed.length + (bulkAppend ? 1 : added.length) > this.maxEditRequests) {
+            await this.replaceSavedQueue(saved.userId, state);
+            return;
+        }
+
+        for (const item of removed) {
+            await this.queueRequest(`/playlists/${saved.id}/items/${item.id}`, 'DELETE');
+            if (item.id === saved.currentItemId) {
+                saved.currentItemId = null;
+            }
+        }
+
+        let inserted = [];
+        const previous = items[start - 1];
+        if (bulkAppend) {
+            // Positions can be renumbered by any insert, so use the items the server created
+            const appended = await this.queueRequest(`/playlists/${saved.id}/items/bulk`, 'POST', { song_ids: added });
+            inserted = appended.items.map(item => this.toSavedItem(item));
+        } else {
+            let anchor = previous ? { after_item_id: previous.id }
+                : oldEnd < items.length ? { before_item_id: items[oldEnd].id } : {};
+            for (const songId of added) {
+                const item = await this.queueRequest(`/playlists/${saved.id}/items`, 'POST', { song_id: songId, ...anchor });
+                inserted.push(this.toSavedItem(item));
+                anchor = { after_item_id: item.id };
+            }
+        }
+        saved.items = [...items.slice(0, start), ...inserted, ...items.slice(oldEnd)];
+
+        const currentItemId = state.current_index !== null ? saved.items[state.current_index].id : null;
+        if (currentItemId !== saved.currentItemId) {
+            await this.queueRequest(`/playlists/${saved.id}`, 'PUT', { current_item_id: currentItemId });
+            saved.currentItemId = currentItemId;
+        }
     }
 
     setupEventListeners() {
@@ -142,6 +345,46 @@ class QueueManager {
         return null;
     }
 
+    /**
+     * Get up to `count` songs that will play after the current one
+     */
+    getUpcomingSongs(count) {
+        const activeQueue = this.shuffleMode ? this.shuffledQueue : this.queue;
+        const upcoming = [];
+
+        for (let offset = 1; offset <= count; offset++) {
+            let index = this.currentIndex + offset;
+            if (index >= activeQueue.length) {
+                if (this.repeatMode !== 'all') break;
+                index %= activeQueue.length;
+            }
+            if (index === this.currentIndex) break;
+            upcoming.push(activeQueue[index]);
+        }
+
+        return upcoming;
+    }
+
+    /**
+     * Ask the service worker to cache the start of the upcoming songs,
+     * so the next track starts without waiting on the network
+     */
+    prefetchUpcoming() {
+        const controller = navigator.serviceWorker && navigator.serviceWorker.controller;
+        if (!controller) return;
+
+        const songIds = this.getUpcomingSongs(this.prefetchCount).map(song => song.id);
+        const key = songIds.join(',');
+        if (songIds.length === 0 || key === this.lastPrefetch) return;
+        this.lastPrefetch = key;
+
+        controller.postMessage({
+            type: 'PREFETCH_AUDIO',
+            apiBase: window.API_BASE_URL,
+            songIds
+        });
+    }
+
     /**
      * Get previous song
      */
@@ -239,6 +482,7 @@ class QueueManager {
         this.repeatMode = modes[(currentModeIndex + 1) % modes.length];
         
         this.updateRepeatButton();
+        this.prefetchUpcoming();
         
         const modeText = {
             'none': 'Repeat off',
@@ -281,6 +525,10 @@ class QueueManager {
      * Update queue display
      */
     updateQueueDisplay() {
+        // Every queue change ends up here, so persist and prefetch from one place
+        this.scheduleSave();
+        this.prefetchUpcoming();
+
         if (!this.queueList) return;
 
         const activeQueue = this.shuffleMode ? this.shuffledQueue : this.queue;
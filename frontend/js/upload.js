@@ -1,5 +1,114 @@
 console.log('Upload.js loaded');
 
+// Files above this size go through resumable chunked upload sessions
+const RESUMABLE_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024;
+const PARALLEL_CHUNKS = 4;
+const CHUNK_RETRIES = 5;
+const BUSY_RETRIES = 5;
+
+/**
+ * fetch() that waits out 503 responses with a Retry-After header (all of
+ * the server's upload slots are taken) and tries again, up to BUSY_RETRIES
+ * times. The body must be re-sendable (a Blob or FormData).
+ */
+async function fetchWhenAvailable(url, options) {
+    for (let attempt = 1; ; attempt++) {
+        const response = await fetch(url, options);
+        const retryAfter = Number(response.headers.get('Retry-After'));
+        if (response.status !== 503 || !retryAfter || attempt > BUSY_RETRIES) {
+            return response;
+        }
+        console.log(`Server busy, retrying in ${retryAfter}s`);
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    }
+}
+
+/**
+ * Upload a large audio file in chunks. Sessions are remembered per file in
+ * localStorage, so retrying the same file (even after a reload) only sends
+ * the byte ranges the server doesn't have yet. Resolves to the final
+ * response of the complete call, like a normal upload.
+ */
+async function resumableUpload(audioFile, formData) {
+    const sessionsUrl = `${window.API_BASE_URL}/songs/upload/sessions`;
+    const storageKey = `upload-session:${audioFile.name}:${audioFile.size}:${audioFile.lastModified}`;
+
+    // Resume a previous session for this file if the server still has it
+    let session = null;
+    const savedSessionId = localStorage.getItem(storageKey);
+    if (savedSessionId) {
+        const statusResponse = await fetch(`${sessionsUrl}/${savedSessionId}`);
+        if (statusResponse.ok) {
+            session = await statusResponse.json();
+            console.log('Resuming upload session', session.id, 'missing:', session.missing);
+        }
+    }
+
+    if (!session) {
+        const sessionData = { filename: audioFile.name, size: audioFile.size };
+        for (const field of ['title', 'artist', 'album', 'genre', 'year', 'user_id']) {
+            if (formData.has(field)) {
+                sessionData[field] = formData.get(field);
+            }
+        }
+        const createResponse = await fetch(`${sessionsUrl}/`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(sessionData)
+        });
+        if (!createResponse.ok) {
+            return createResponse;
+        }
+        session = await createResponse.json();
+        localStorage.setItem(storageKey, session.id);
+    }
+
+    // Split the missing ranges into chunks and send them a few at a time
+    const chunks = [];
+    for (const [start, end] of session.missing) {
+        for (let offset = start; offset < end; offset += UPLOAD_CHUNK_SIZE) {
+            chunks.push([offset, Math.min(offset + UPLOAD_CHUNK_SIZE, end)]);
+        }
+    }
+
+    const sendChunk = async ([start, end]) => {
+        for (let attempt = 1; ; attempt++) {
+            try {
+                const response = await fetchWhenAvailable(`${sessionsUrl}/${session.id}?offset=${start}`, {
+                    method: 'PUT',
+                    body: audioFile.slice(start, end)
+                });
+                if (response.ok) return;
+                throw new Error(`Chunk upload failed: ${response.status}`);
+            } catch (error) {
+                if (attempt >= CHUNK_RETRIES) throw error;
+                await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+            }
+        }
+    };
+
+    const workers = Array.from({ length: PARALLEL_CHUNKS }, async () => {
+        while (chunks.length > 0) {
+            await sendChunk(chunks.shift());
+        }
+    });
+    await Promise.all(workers);
+
+    const completeData = new FormData();
+    if (formData.has('image')) {
+        completeData.append('image', formData.get('image'));
+    }
+    const response = await fetchWhenAvailable(`${sessionsUrl}/${session.id}/complete`, {
+        method: 'POST',
+        body: completeData
+    });
+    if (response.ok) {
+        localStorage.removeItem(storageKey);
+    }
+    return response;
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     console.log('DOM loaded');
     console.log('API_BASE_URL:', window.API_BASE_URL);
@@ -106,12 +215,18 @@ document.addEventListener('DOMContentLoaded', function() {
         uploadResult.style.display = 'none';
         
         try {
-            console.log('Making request to', `${window.API_BASE_URL}/songs/upload`);
-            
-            const response = await fetch(`${window.API_BASE_URL}/songs/upload`, {
-                method: 'POST',
-                body: formData
-            });
+            let response;
+            if (audioFile.size > RESUMABLE_UPLOAD_THRESHOLD) {
+                console.log('Large file, using resumable upload');
+                response = await resumableUpload(audioFile, formData);
+            } else {
+                console.log('Making request to', `${window.API_BASE_URL}/songs/upload`);
+                
+                response = await fetchWhenAvailable(`${window.API_BASE_URL}/songs/upload`, {
+                    method: 'POST',
+                    body: formData
+                });
+            }
             
             console.log('Response received:', response.status, response.statusText);
             
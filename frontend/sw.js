@@ -2,6 +2,16 @@
 const CACHE_NAME = 'rock-em-all-v1';
 const STATIC_CACHE = 'static-v1';
 const DYNAMIC_CACHE = 'dynamic-v1';
+const AUDIO_CACHE = 'audio-v1';
+
+// Audio is cached in fixed-size chunks so that a partially fetched track can
+// answer Range requests for the part it holds. Whole tracks are evicted
+// least recently used first once the cache grows past its budget.
+const AUDIO_URL_PATTERN = /\/songs\/\d+\/file$/;
+const AUDIO_CHUNK_SIZE = 256 * 1024;
+const AUDIO_PREFETCH_BYTES = 1024 * 1024; // first segment of each upcoming track
+const AUDIO_PREFETCH_TRACKS = 3;
+const AUDIO_CACHE_MAX_BYTES = 200 * 1024 * 1024;
 
 // Files to cache immediately
 const STATIC_FILES = [
@@ -53,7 +63,7 @@ self.addEventListener('activate', event => {
             .then(cacheNames => {
                 return Promise.all(
                     cacheNames.map(cacheName => {
-                        if (cacheName !== STATIC_CACHE && cacheName !== DYNAMIC_CACHE) {
+                        if (cacheName !== STATIC_CACHE && cacheName !== DYNAMIC_CACHE && cacheName !== AUDIO_CACHE) {
                             console.log('Deleting old cache:', cacheName);
                             return caches.delete(cacheName);
                         }
@@ -82,6 +92,12 @@ self.addEventListener('fetch', event => {
         return;
     }
 
+    // Audio has its own chunked cache that understands Range requests
+    if (AUDIO_URL_PATTERN.test(url.pathname)) {
+        event.respondWith(respondWithAudio(request));
+        return;
+    }
+
     event.respondWith(
         caches.match(request)
             .then(response => {
@@ -147,6 +163,364 @@ function shouldCache(request) {
     return false;
 }
 
+// Serve audio from the chunk cache when it holds the start of the requested
+// range, otherwise from the network while caching what comes back
+async function respondWithAudio(request) {
+    try {
+        const index = await getAudioIndex();
+        const entry = index.get(request.url);
+        if (entry) {
+            const cached = await cachedAudioResponse(entry, request.headers.get('Range'));
+            if (cached) {
+                return cached;
+            }
+        }
+    } catch (error) {
+        console.error('Audio cache lookup failed:', error);
+    }
+
+    const response = await fetch(request);
+    return cacheAudioResponse(request.url, response);
+}
+
+async function cachedAudioResponse(entry, rangeHeader) {
+    let start = 0;
+    let end = entry.size - 1;
+    if (rangeHeader) {
+        const match = /^bytes=(\d*)-(\d*)$/.exec(rangeHeader.trim());
+        if (!match || (match[1] === '' && match[2] === '')) {
+            return null;
+        }
+        if (match[1] === '') {
+            start = Math.max(entry.size - Number(match[2]), 0);
+        } else {
+            start = Number(match[1]);
+            if (match[2] !== '') {
+                end = Math.min(Number(match[2]), entry.size - 1);
+            }
+        }
+        if (start >= entry.size || end < start) {
+            return new Response(null, {
+                status: 416,
+                headers: { 'Content-Range': `bytes */${entry.size}` }
+            });
+        }
+    }
+
+    // Collect the run of cached chunks from `start`; a short 206 is fine,
+    // the player requests the rest (from the network) when it gets there
+    const cache = await caches.open(AUDIO_CACHE);
+    const firstChunk = Math.floor(start / AUDIO_CHUNK_SIZE);
+    const parts = [];
+    let chunkIndex = firstChunk;
+    while (chunkIndex * AUDIO_CHUNK_SIZE <= end && entry.chunks.has(chunkIndex)) {
+        const chunk = await cache.match(audioPartKey(entry.url, chunkIndex));
+        if (!chunk) {
+            // Removed behind our back, e.g. by the browser under storage pressure
+            entry.chunks.delete(chunkIndex);
+            break;
+        }
+        parts.push(await chunk.blob());
+        chunkIndex++;
+    }
+    if (parts.length === 0) {
+        return null;
+    }
+
+    const last = Math.min(end, chunkIndex * AUDIO_CHUNK_SIZE - 1, entry.size - 1);
+    if (!rangeHeader && last < entry.size - 1) {
+        return null;
+    }
+
+    const offset = firstChunk * AUDIO_CHUNK_SIZE;
+    const body = new Blob(parts).slice(start - offset, last + 1 - offset);
+    const headers = {
+        'Content-Type': entry.type,
+        'Content-Length': String(body.size),
+        'Accept-Ranges': 'bytes',
+        'ETag': entry.etag
+    };
+    if (rangeHeader) {
+        headers['Content-Range'] = `bytes ${start}-${last}/${entry.size}`;
+    }
+
+    touchAudioEntry(entry);
+    return new Response(body, { status: rangeHeader ? 206 : 200, headers });
+}
+
+// Pass a network response through to the page, storing its chunks as the
+// page reads them (nothing more is downloaded than the player asked for)
+function cacheAudioResponse(url, response) {
+    const range = responseByteRange(response);
+    const etag = response.headers.get('ETag');
+    if (!range || !etag || !response.body) {
+        return response;
+    }
+
+    const writer = new AudioChunkWriter(url, range.start, range.size, etag, response.headers.get('Content-Type'));
+    const body = response.body.pipeThrough(new TransformStream({
+        transform(data, controller) {
+            writer.write(data);
+            controller.enqueue(data);
+        }
+    }));
+    return new Response(body, {
+        status: response.status,
+        statusText: response.statusText,
+        headers: response.headers
+    });
+}
+
+// Start offset and total size of a 200/206 response, or null if unknown
+function responseByteRange(response) {
+    if (response.status === 206) {
+        const match = /^bytes (\d+)-\d+\/(\d+)$/.exec(response.headers.get('Content-Range') || '');
+        return match ? { start: Number(match[1]), size: Number(match[2]) } : null;
+    }
+    if (response.status === 200) {
+        const length = Number(response.headers.get('Content-Length'));
+        return length ? { start: 0, size: length } : null;
+    }
+    return null;
+}
+
+// Splits a byte stream starting at `start` into cache chunks. Bytes before
+// the first chunk boundary are dropped; incomplete chunks are never stored.
+class AudioChunkWriter {
+    constructor(url, start, size, etag, type) {
+        this.size = size;
+        this.chunkIndex = Math.ceil(start / AUDIO_CHUNK_SIZE);
+        this.skip = this.chunkIndex * AUDIO_CHUNK_SIZE - start;
+        this.parts = [];
+        this.partBytes = 0;
+        this.ready = openAudioEntry(url, size, etag, type).catch(error => {
+            console.error('Error opening audio cache:', error);
+            return null;
+        });
+    }
+
+    write(data) {
+        if (this.skip > 0) {
+            const skipped = Math.min(this.skip, data.length);
+            data = data.subarray(skipped);
+            this.skip -= skipped;
+        }
+
+        while (data.length > 0) {
+            const length = audioChunkLength(this.size, this.chunkIndex);
+            if (length <= 0) {
+                return;
+            }
+            const piece = data.subarray(0, length - this.partBytes);
+            this.parts.push(piece);
+            this.partBytes += piece.length;
+            data = data.subarray(piece.length);
+
+            if (this.partBytes === length) {
+                const chunkIndex = this.chunkIndex;
+                const blob = new Blob(this.parts);
+                this.ready = this.ready.then(async state => {
+                    if (state) {
+                        await putAudioChunk(state, chunkIndex, blob);
+                    }
+                    return state;
+                });
+                this.chunkIndex++;
+                this.parts = [];
+                this.partBytes = 0;
+            }
+        }
+    }
+}
+
+// url -> { url, size, etag, type, chunks: Set of chunk indices, lastUsed }
+let audioIndexPromise = null;
+
+// The index lives in memory and in one JSON entry per track, so it
+// survives the service worker being stopped
+function getAudioIndex() {
+    if (!audioIndexPromise) {
+        audioIndexPromise = caches.open(AUDIO_CACHE)
+            .then(async cache => {
+                const index = new Map();
+                const requests = await cache.keys();
+                for (const request of requests) {
+                    if (!request.url.endsWith('sw-part=meta')) {
+                        continue;
+                    }
+                    const response = await cache.match(request);
+                    const entry = await response.json();
+                    entry.chunks = new Set(entry.chunks);
+                    index.set(entry.url, entry);
+                }
+                return index;
+            })
+            .catch(error => {
+                audioIndexPromise = null;
+                throw error;
+            });
+    }
+    return audioIndexPromise;
+}
+
+function audioPartKey(url, part) {
+    return `${url}${url.includes('?') ? '&' : '?'}sw-part=${part}`;
+}
+
+function audioChunkLength(size, chunkIndex) {
+    return Math.min(AUDIO_CHUNK_SIZE, size - chunkIndex * AUDIO_CHUNK_SIZE);
+}
+
+function audioEntryBytes(entry) {
+    let total = 0;
+    for (const chunkIndex of entry.chunks) {
+        total += audioChunkLength(entry.size, chunkIndex);
+    }
+    return total;
+}
+
+async function openAudioEntry(url, size, etag, type) {
+    const cache = await caches.open(AUDIO_CACHE);
+    const index = await getAudioIndex();
+    let entry = index.get(url);
+    if (entry && (entry.etag !== etag || entry.size !== size)) {
+        // The file changed on the server
+        await deleteAudioEntry(cache, index, entry);
+        entry = null;
+    }
+    if (!entry) {
+        entry = { url, size, etag, type: type || 'audio/mpeg', chunks: new Set(), lastUsed: Date.now() };
+        index.set(url, entry);
+    }
+    return { cache, index, entry };
+}
+
+async function putAudioChunk({ cache, index, entry }, chunkIndex, blob) {
+    // Skip chunks we already have and tracks evicted or replaced meanwhile
+    if (entry.chunks.has(chunkIndex) || index.get(entry.url) !== entry) {
+        return;
+    }
+    try {
+        await cache.put(audioPartKey(entry.url, chunkIndex), new Response(blob));
+        entry.chunks.add(chunkIndex);
+        entry.lastUsed = Date.now();
+        await saveAudioEntry(cache, entry);
+        await evictAudio(cache, index, entry.url);
+    } catch (error) {
+        console.error('Error caching audio:', error);
+    }
+}
+
+function saveAudioEntry(cache, entry) {
+    const data = { ...entry, chunks: [...entry.chunks] };
+    return cache.put(audioPartKey(entry.url, 'meta'), new Response(JSON.stringify(data), {
+        headers: { 'Content-Type': 'application/json' }
+    }));
+}
+
+function touchAudioEntry(entry) {
+    entry.lastUsed = Date.now();
+    caches.open(AUDIO_CACHE)
+        .then(cache => saveAudioEntry(cache, entry))
+        .catch(error => console.error('Error updating audio cache:', error));
+}
+
+async function deleteAudioEntry(cache, index, entry) {
+    index.delete(entry.url);
+    await Promise.all([
+        ...[...entry.chunks].map(chunkIndex => cache.delete(audioPartKey(entry.url, chunkIndex))),
+        cache.delete(audioPartKey(entry.url, 'meta'))
+    ]);
+}
+
+// Drop least recently used tracks until the cache fits its budget
+async function evictAudio(cache, index, keepUrl) {
+    let total = 0;
+    for (const entry of index.values()) {
+        total += audioEntryBytes(entry);
+    }
+    if (total <= AUDIO_CACHE_MAX_BYTES) {
+        return;
+    }
+
+    const candidates = [...index.values()]
+        .filter(entry => entry.url !== keepUrl)
+        .sort((a, b) => a.lastUsed - b.lastUsed);
+    for (const entry of candidates) {
+        if (total <= AUDIO_CACHE_MAX_BYTES) {
+            break;
+        }
+        total -= audioEntryBytes(entry);
+        await deleteAudioEntry(cache, index, entry);
+    }
+}
+
+function hasAudioChunks(entry, start, end) {
+    for (let chunkIndex = Math.floor(start / AUDIO_CHUNK_SIZE); chunkIndex * AUDIO_CHUNK_SIZE <= end; chunkIndex++) {
+        if (!entry.chunks.has(chunkIndex)) {
+            return false;
+        }
+    }
+    return true;
+}
+
+// Warm the first segment of the upcoming tracks, using the backend's
+// manifest to skip tracks that are already cached and unchanged
+async function prefetchAudio(apiBase, songIds) {
+    const ids = songIds.slice(0, AUDIO_PREFETCH_TRACKS);
+    if (ids.length === 0) {
+        return;
+    }
+
+    const query = ids.map(id => `ids=${encodeURIComponent(id)}`).join('&');
+    const manifestResponse = await fetch(new URL(`${apiBase}/songs/manifest?${query}`, self.location.origin), {
+        cache: 'no-store'
+    });
+    if (!manifestResponse.ok) {
+        return;
+    }
+    const manifest = await manifestResponse.json();
+    const index = await getAudioIndex();
+
+    for (const item of manifest) {
+        const url = new URL(`${apiBase}${item.url}`, self.location.origin).href;
+        const end = Math.min(item.size, AUDIO_PREFETCH_BYTES) - 1;
+        const entry = index.get(url);
+        if (entry && entry.etag === item.etag && hasAudioChunks(entry, 0, end)) {
+            continue;
+        }
+
+        try {
+            const response = await fetch(url, { headers: { Range: `bytes=0-${end}` } });
+            const range = responseByteRange(response);
+            if (!range || !response.body) {
+                continue;
+            }
+
+            const writer = new AudioChunkWriter(url, range.start, range.size,
+                response.headers.get('ETag') || item.etag, item.media_type);
+            const reader = response.body.getReader();
+            let received = 0;
+            while (received <= end) {
+                const { done, value } = await reader.read();
+                if (done) {
+                    break;
+                }
+                writer.write(value);
+                received += value.length;
+            }
+            // A server that ignores Range sends the whole file; the first segment is enough
+            reader.cancel().catch(() => {});
+            await writer.ready;
+        } catch (error) {
+            console.error('Error prefetching audio:', error);
+        }
+    }
+}
+
+// Prefetches run one at a time, in the order the page asked for them
+let audioPrefetchQueue = Promise.resolve();
+
 // Background sync for offline actions
 self.addEventListener('sync', event => {
     if (event.tag === 'background-sync') {
@@ -213,6 +587,14 @@ self.addEventListener('message', event => {
         self.skipWaiting();
     }
     
+    if (event.data && event.data.type === 'PREFETCH_AUDIO') {
+        const { apiBase, songIds } = event.data;
+        audioPrefetchQueue = audioPrefetchQueue
+            .then(() => prefetchAudio(apiBase, songIds))
+            .catch(error => console.error('Error prefetching audio:', error));
+        event.waitUntil(audioPrefetchQueue);
+    }
+
     if (event.data && event.data.type === 'GET_CACHE_SIZE') {
         caches.keys().then(cacheNames => {
             Promise.all(